@@ -5,8 +5,16 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 from __future__ import annotations
 
-from .__about__ import __version__
-
 __all__ = [
     "__version__",
 ]
+
+
+def __getattr__(name: str) -> str:
+    # Finding the version imports importlib.metadata, which takes longer than
+    # running a hook on a few files, so it is only done when asked for.
+    if name == "__version__":
+        from .__about__ import __version__
+
+        return __version__
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,117 +2,206 @@
 
 from __future__ import annotations
 
+import codecs
 import functools
+import importlib
+import io
 import pathlib
-import re
 import sys
-from collections.abc import Sequence
-from typing import Any
+import typing
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import Any, NamedTuple
 
+from ..diff import ChangedLines, add_diff_argument, is_line_changed
+from ..profiling import span
 from ..util import (
     ABCArgs,
     ABCHook,
+    AtomicReplacement,
     ExitCode,
-    HashableDict,
     load_json_source,
+    write_file_atomic,
 )
 from . import char_map
 
-sys.stdout.reconfigure(  # type: ignore[union-attr]
-    encoding="utf-8"  # For Windows: we want to be sure to use UTF-8
-)
-RulesDict = dict[re.Pattern[Any], str]
+if typing.TYPE_CHECKING:
+    from .engine import NormalizationEngine
+    from .report import Reporter
+    from .vectorized import VectorizedEngine
+
+# Only files with something to fix need the rules, or the reports.
+_LAZY_ATTRIBUTES = {
+    "engine": ("engine", None),
+    "presentation_forms": ("presentation_forms", None),
+    "report": ("report", None),
+    "NormalizationEngine": ("engine", "NormalizationEngine"),
+    "get_engine": ("engine", "get_engine"),
+    "Reporter": ("report", "Reporter"),
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    module = importlib.import_module(f".{module_name}", __name__)
+    return module if attribute is None else getattr(module, attribute)
 
 
 def apply_rules_to_lines(
     line: str,
-    rules: RulesDict,
-    exclude: re.Pattern[str],
-    file_name: pathlib.Path | str,
-    line_no: str | int,
-) -> tuple[ExitCode, str]:
+    engine: NormalizationEngine,
+    reporter: Reporter,
+    line_no: int,
+    col_offset: int = 0,
+) -> tuple[ExitCode, str, bool]:
     """Check the text for rules.
 
     Args:
         line (str): Line to check the rules.
-        rules (RulesDict): The rules to check form.
-        exclude (re.Pattern): characters to exclude from check.
-        file_name (str): the name of the file being checked.
+        engine (NormalizationEngine): The compiled rules to apply, and the text
+            they exclude.
+        reporter (Reporter): Collects the reports for the file being checked.
         line_no (int): The line number being checked.
+        col_offset (int): Columns before the start of line, when it is only a part
+            of the line. Defaults to 0.
 
     Returns:
-        (ExitCode, str): (The PASS/FAIL state, The new line).
+        (ExitCode, str, bool): (The PASS/FAIL state, The new line,
+            True if a character is left not fixed).
     """
-    exit_code = ExitCode.OK
-    new_line = exclude.sub(" ", line)  # Replace with space to not affect col numbers
-
-    if not char_map.is_contains_non_general_form(max(new_line)):
-        return exit_code, line
-
-    new_chars: list[str] = []
-    exit_code = ExitCode.FAIL
-
-    for col_no, c in enumerate(line, start=1):
-        new_c = apply_rule(rules=HashableDict(rules), character=c)
-        new_c_as_unicode_hex = [f"\\u{ord(c):04x}" for c in new_c]
-        fix_char_loc = (
-            f"{file_name}:{line_no}:{col_no} [{new_c} ({new_c_as_unicode_hex})]"
+    new_line, fixes = engine.normalize(line)
+    if not fixes:
+        return ExitCode.OK, line, False
+
+    is_incomplete = False
+    for fix in fixes:
+        reporter.fix(line_no=line_no, col_offset=col_offset, fix=fix)
+        is_incomplete = is_incomplete or char_map.is_contains_non_general_form(
+            fix.replacement
         )
-        if c != new_c:
-            output_str = f"[Fixed] {fix_char_loc}"
-        elif char_map.is_contains_non_general_form(new_c):
-            output_str = f"[Not Fixed] {fix_char_loc}"
-        else:
-            output_str = ""
 
-        if output_str:
-            print(output_str)
-            output_str = ""
+    return ExitCode.FAIL, new_line, is_incomplete
 
-        new_chars.append(new_c)
 
-    new_line = "".join(new_chars)
+class LinePiece(NamedTuple):
+    """A line, or a part of a line that is too long to hold at once."""
 
-    return exit_code, new_line
+    text: str
+    line_no: int
+    col_offset: int
 
 
-def get_rules(custom_rules: char_map.CHAR_MAP_TYPE) -> RulesDict:
-    """Return the rules from a given config string.
+def iter_line_pieces(
+    f: typing.TextIO,
+    chunk_size: int,
+    split_point: Callable[[str], int] = len,
+) -> Iterator[LinePiece]:
+    """Read a text stream in chunks, splitting it into lines.
 
     Args:
-        custom_rules (str): Any additional rules to apply.
+        f (typing.TextIO): Stream opened with ``newline=""``.
+        chunk_size (int): How many characters to read at once. Lines longer than
+            this are split into several pieces.
+        split_point (Callable[[str], int]): How much of the start of a long line
+            can be a piece on its own, as :meth:`NormalizationEngine.split_point`.
+            Defaults to all of it.
+
+    Yields:
+        LinePiece: The lines, in order.
+    """
+    line_no = 1
+    col_offset = 0
+    pending = ""
+    while chunk := f.read(chunk_size):
+        *lines, pending = io.StringIO(pending + chunk, newline="").readlines()
+        # A trailing "\r" could be the start of a "\r\n" split across chunks.
+        if pending.endswith("\n"):
+            lines.append(pending)
+            pending = ""
+        for line in lines:
+            yield LinePiece(line, line_no, col_offset)
+            line_no += 1
+            col_offset = 0
+        if len(pending) >= chunk_size:
+            head = pending[: split_point(pending.removesuffix("\r"))]
+            if head:
+                pending = pending[len(head) :]
+                yield LinePiece(head, line_no, col_offset)
+                col_offset += len(head)
+    if pending:
+        yield LinePiece(pending, line_no, col_offset)
+
+
+def normalize_line_pieces(
+    pieces: Iterable[LinePiece],
+    write: Callable[[str], object],
+    engine: NormalizationEngine,
+    reporter: Reporter,
+    line_filter: Callable[[int], bool] | None = None,
+) -> tuple[ExitCode, bool]:
+    """Apply the rules to lines, passing on the new lines as they are made.
 
-    Returns:
-        RulesDict: The compiles rules.
+    Args:
+        pieces (Iterable[LinePiece]): Lines to check the rules.
+        write (Callable[[str], object]): Called with every new line.
+        engine (NormalizationEngine): The compiled rules to apply, and the text
+            they exclude.
+        reporter (Reporter): Collects the reports for the file being checked.
+        line_filter (Callable[[int], bool] | None): Only check the lines, by their
+            number, that this is True for. The others are passed on as they are.
+            Defaults to checking every line.
 
+    Returns:
+        (ExitCode, bool): (The PASS/FAIL state, True if any line was changed).
     """
-    regex_rules = {}
-    complete_rules: char_map.CHAR_MAP_TYPE = {}
-    complete_rules.update(char_map.CHAR_MAP)
-    complete_rules.update(custom_rules)
-    for _rule_name, char_mapping_rule in complete_rules.items():
-        for expected_out, expected_regex in char_mapping_rule["rule"].items():
-            regex_rules.update({re.compile(expected_regex): expected_out})
-    return regex_rules
+    exit_code = int(ExitCode.OK)
+    is_changed = False
+    # Reported once the whole line is done, after the fixes of all of its pieces.
+    incomplete_line_no = 0
+    for piece in pieces:
+        if incomplete_line_no and piece.line_no != incomplete_line_no:
+            reporter.incomplete(line_no=incomplete_line_no)
+            incomplete_line_no = 0
+        if line_filter is not None and not line_filter(piece.line_no):
+            write(piece.text)
+            continue
+        intermediate_exit_code, new_line, is_incomplete = apply_rules_to_lines(
+            line=piece.text,
+            line_no=piece.line_no,
+            col_offset=piece.col_offset,
+            reporter=reporter,
+            engine=engine,
+        )
+        exit_code |= intermediate_exit_code
+        is_changed = is_changed or new_line != piece.text
+
+        if is_incomplete:
+            incomplete_line_no = piece.line_no
+
+        write(new_line)
+    if incomplete_line_no:
+        reporter.incomplete(line_no=incomplete_line_no)
+    return ExitCode(exit_code), is_changed
 
 
-@functools.lru_cache
-def apply_rule(rules: RulesDict, character: str) -> str:
-    """Apply the rule from the list of rules to the character.
+def stream_contains_non_general_form(fp: typing.BinaryIO, chunk_size: int) -> bool:
+    """Check the rest of a binary stream for characters not in their general form.
 
     Args:
-        rules (RulesDict): rules to apply for the character.
-        character (str): The letter/character to check against.
+        fp (typing.BinaryIO): Stream to read.
+        chunk_size (int): How many bytes to read at once.
 
     Returns:
-        str: The character after applying any rules.
+        bool: True if there are any.
     """
-    new_char = character
-    for reg_pattern, replace_char in rules.items():
-        if reg_pattern.match(character):
-            new_char = reg_pattern.sub(replace_char, character)
-            break
-    return new_char
+    tail = b""
+    while chunk := fp.read(chunk_size):
+        region = tail + chunk
+        if char_map.NON_GENERAL_FORM_BYTES_REGEX.search(region):
+            return True
+        tail = region[-2:]  # Every match is 3 bytes, it may span chunks.
+    return False
 
 
 class ArabicPresentationFormArgs(ABCArgs):
@@ -120,6 +209,11 @@ class ArabicPresentationFormArgs(ABCArgs):
 
     excluded_chars: str
     custom_rules: char_map.CHAR_MAP_TYPE
+    chunk_size: int
+    summary: bool
+    max_reports: int | None
+    backend: str
+    diff: ChangedLines | None
 
 
 class ArabicPresentationFormChecker(ABCHook):
@@ -145,6 +239,39 @@ class ArabicPresentationFormChecker(ABCHook):
                 + ". To exclude a unicode character, overwrite its default entry."
             ),
         )
+        self.parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=16 * 1024 * 1024,
+            metavar="N",
+            help=(
+                "Files larger than N bytes are read, and written, in chunks of N"
+                " characters instead of all at once."
+            ),
+        )
+        self.parser.add_argument(
+            "--summary",
+            action="store_true",
+            help="Only report how many characters each rule fixed, per file.",
+        )
+        self.parser.add_argument(
+            "--max-reports",
+            type=int,
+            default=None,
+            metavar="N",
+            help="Report at most N characters per file.",
+        )
+        self.parser.add_argument(
+            "--backend",
+            choices=["python", "numpy", "bytes"],
+            default="python",
+            help=(
+                "How to apply the rules to files read at once. numpy: all characters"
+                " at once, faster on large files, if NumPy is installed. bytes: on"
+                " the UTF-8 of the files, without decoding them."
+            ),
+        )
+        add_diff_argument(self.parser)
 
     def implementation(
         self,
@@ -152,34 +279,173 @@ class ArabicPresentationFormChecker(ABCHook):
         args: ArabicPresentationFormArgs,
     ) -> ExitCode:
         """Check Implementation."""
-        exit_code = int(ExitCode.OK)
-        exclude_regex = re.compile(args.excluded_chars)
-
-        new_file_lines = []
-        with file_name.open("r", encoding="utf-8") as f:
-            for line_no, line in enumerate(iter(f.readlines()), start=1):
-                intermediate_exit_code, new_line = apply_rules_to_lines(
-                    line=line,
-                    line_no=line_no,
-                    file_name=file_name,
-                    rules=get_rules(args.custom_rules),
-                    exclude=exclude_regex,
+        if args.diff is not None and not args.diff.get_ranges(file_name):
+            return ExitCode.OK
+        raw = self.prefetched(file_name)
+        if raw is None:
+            if file_name.stat().st_size > args.chunk_size:
+                return self._implementation_streamed(file_name, args)
+            with span("read"):
+                raw = file_name.read_bytes()
+        bom = codecs.BOM_UTF8 if raw.startswith(codecs.BOM_UTF8) else b""
+        # Most files have nothing to fix, find that out without decoding them.
+        with span("scan"):
+            if not char_map.NON_GENERAL_FORM_BYTES_REGEX.search(raw, len(bom)):
+                return ExitCode.OK
+
+        reporter = self._get_reporter(file_name, args)
+        try:
+            with span("normalize"):
+                exit_code, new_raw = self._normalize_raw(
+                    raw, bom, file_name, args, reporter
                 )
-                exit_code |= intermediate_exit_code
+        finally:
+            with span("report"):
+                reporter.flush()
 
-                if char_map.is_contains_non_general_form(
-                    max(exclude_regex.sub("", new_line) or " ")
-                ):
-                    print(f"Incomplete Fixes Applied: {file_name}:{line_no}")
+        if new_raw != raw:
+            with span("write"):
+                write_file_atomic(file_name, new_raw)
+        return exit_code
 
-                new_file_lines.append(new_line)
+    def _normalize_raw(
+        self,
+        raw: bytes,
+        bom: bytes,
+        file_name: pathlib.Path,
+        args: ArabicPresentationFormArgs,
+        reporter: Reporter,
+    ) -> tuple[ExitCode, bytes]:
+        """Apply the rules to a whole file, with the chosen backend."""
+        line_filter = self._get_line_filter(file_name, args)
+        engine = self._get_engine(args)
+        # Only the python backend applies sequences and protected text.
+        if args.backend == "bytes" and engine.is_table_only:
+            from .bytes_engine import get_bytes_engine
+
+            return get_bytes_engine(engine).normalize(
+                raw,
+                start=len(bom),
+                reporter=reporter,
+                line_filter=line_filter,
+            )
+
+        text = raw[len(bom) :].decode("utf-8")
+        exit_code, new_text = self._normalize_text(text, reporter, line_filter, args)
+        return exit_code, bom + new_text.encode("utf-8") if new_text != text else raw
+
+    def _normalize_text(
+        self,
+        text: str,
+        reporter: Reporter,
+        line_filter: Callable[[int], bool] | None,
+        args: ArabicPresentationFormArgs,
+    ) -> tuple[ExitCode, str]:
+        """Apply the rules to the whole text of a file."""
+        vectorized_engine = self._get_vectorized_engine(args)
+        if vectorized_engine is not None:
+            return vectorized_engine.normalize_text(
+                text, reporter=reporter, line_filter=line_filter
+            )
+
+        new_file_lines: list[str] = []
+        # newline="": keep the line endings as they are, they are written back as is
+        with io.StringIO(text, newline="") as f:
+            exit_code, is_changed = normalize_line_pieces(
+                pieces=(LinePiece(ln, n, 0) for n, ln in enumerate(f, start=1)),
+                write=new_file_lines.append,
+                engine=self._get_engine(args),
+                reporter=reporter,
+                line_filter=line_filter,
+            )
+        return exit_code, "".join(new_file_lines) if is_changed else text
+
+    @staticmethod
+    def _get_line_filter(
+        file_name: pathlib.Path, args: ArabicPresentationFormArgs
+    ) -> Callable[[int], bool] | None:
+        if args.diff is None:
+            return None
+        return functools.partial(is_line_changed, args.diff.get_ranges(file_name))
+
+    @staticmethod
+    def _get_engine(args: ArabicPresentationFormArgs) -> NormalizationEngine:
+        from .engine import get_engine
+
+        # Built once per run, with the excluded characters compiled in.
+        return get_engine(args.custom_rules, cache_dir=args.cache_dir).excluding(
+            args.excluded_chars
+        )
 
-        with file_name.open("w", encoding="utf-8") as f:
-            f.writelines(new_file_lines)
-        return ExitCode(exit_code)
+    @classmethod
+    def _get_vectorized_engine(
+        cls, args: ArabicPresentationFormArgs
+    ) -> VectorizedEngine | None:
+        engine = cls._get_engine(args)
+        if args.backend != "numpy" or not engine.is_table_only:
+            return None
+        try:
+            from .vectorized import get_vectorized_engine
+        except ImportError:  # NumPy is optional, fall back to the engine itself.
+            return None
+        return get_vectorized_engine(engine)
+
+    @staticmethod
+    def _get_reporter(
+        file_name: pathlib.Path, args: ArabicPresentationFormArgs
+    ) -> Reporter:
+        from .report import Reporter
+
+        return Reporter(file_name, summary=args.summary, max_reports=args.max_reports)
+
+    def _implementation_streamed(
+        self,
+        file_name: pathlib.Path,
+        args: ArabicPresentationFormArgs,
+    ) -> ExitCode:
+        """Check Implementation, holding no more than a few chunks in memory."""
+        with file_name.open("rb") as fp:
+            bom = codecs.BOM_UTF8 if fp.read(3) == codecs.BOM_UTF8 else b""
+            if not bom:
+                fp.seek(0)
+            with span("scan"):
+                if not stream_contains_non_general_form(fp, args.chunk_size):
+                    return ExitCode.OK
+
+        encoding = "utf-8-sig" if bom else "utf-8"
+        reporter = self._get_reporter(file_name, args)
+        with AtomicReplacement(file_name) as replacement:
+            with (
+                file_name.open(encoding=encoding, newline="") as f_in,
+                replacement.tmp_path.open("w", encoding=encoding, newline="") as f_out,
+            ):
+                try:
+                    # Reading and writing are interleaved with normalizing.
+                    with span("normalize"):
+                        engine = self._get_engine(args)
+                        exit_code, is_changed = normalize_line_pieces(
+                            pieces=iter_line_pieces(
+                                f_in,
+                                chunk_size=args.chunk_size,
+                                split_point=engine.split_point,
+                            ),
+                            write=f_out.write,
+                            engine=engine,
+                            reporter=reporter,
+                            line_filter=self._get_line_filter(file_name, args),
+                        )
+                finally:
+                    with span("report"):
+                        reporter.flush()
+            if is_changed:
+                replacement.replace()
+        return exit_code
 
 
 def main(argv: Sequence[str] | None = None) -> int:
     """Main entrypoint."""
+    sys.stdout.reconfigure(  # type: ignore[union-attr]
+        encoding="utf-8"  # For Windows: we want to be sure to use UTF-8
+    )
     argparser = ArabicPresentationFormChecker()
     return argparser.run(argv=argv)
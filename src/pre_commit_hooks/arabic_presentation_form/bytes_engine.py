@@ -0,0 +1,195 @@
+"""Normalization engine on the UTF-8 bytes of a file, without decoding it.
+
+Every presentation form is a 3 byte UTF-8 sequence, so the rules can be applied
+to the raw bytes: a bytes regex finds the sequences, and they are replaced by the
+UTF-8 of their general form. Only the lines with something to fix are visited,
+and only those that change are spliced into the new file.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+import typing
+from collections.abc import Callable
+from typing import NamedTuple
+
+from ..util import ExitCode
+from . import char_map
+from .engine import Fix, NormalizationEngine
+
+if typing.TYPE_CHECKING:
+    from .report import Reporter
+
+# The bytes that continue a UTF-8 sequence, dropped to count the characters.
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+class _ByteFix(NamedTuple):
+    new_bytes: bytes
+    original: str
+    replacement: str
+    rule_name: str
+    is_incomplete: bool
+
+
+class BytesEngine:
+    """The table of a NormalizationEngine, as UTF-8 sequences."""
+
+    def __init__(self, engine: NormalizationEngine) -> None:
+        """Encode the table of the engine.
+
+        Args:
+            engine (NormalizationEngine): The compiled rules, with no sequences or
+                protected text, see NormalizationEngine.is_table_only.
+        """
+        self._fixes = {
+            chr(codepoint).encode("utf-8"): _ByteFix(
+                new_bytes=new_char.encode("utf-8"),
+                original=chr(codepoint),
+                replacement=new_char,
+                rule_name=engine.rule_names.get(codepoint, ""),
+                is_incomplete=char_map.is_contains_non_general_form(new_char),
+            )
+            for codepoint, new_char in engine.table.items()
+        }
+        # Left as they are, and skipped: a lookahead in the regexes slows them down.
+        self._excluded = frozenset(chr(cp).encode("utf-8") for cp in engine.excluded)
+        replaceable = b"|".join(map(re.escape, self._fixes))
+        self._candidates = re.compile(
+            char_map.NON_GENERAL_FORM_BYTES_REGEX.pattern
+            + (b"|" + replaceable if replaceable else b"")
+        )
+
+    def normalize(
+        self,
+        raw: bytes,
+        start: int,
+        reporter: Reporter,
+        line_filter: Callable[[int], bool] | None = None,
+    ) -> tuple[ExitCode, bytes]:
+        """Apply the rules to the UTF-8 of a file, like normalize_line_pieces.
+
+        Args:
+            raw (bytes): The file.
+            start (int): Where its text starts, after any byte order mark.
+            reporter (Reporter): Collects the reports for the file being checked.
+            line_filter (Callable[[int], bool] | None): Only check the lines, by their
+                number, that this is True for. Defaults to checking every line.
+
+        Returns:
+            (ExitCode, bytes): (The PASS/FAIL state, The new file).
+        """
+        exit_code = ExitCode.OK
+        new_pieces: list[bytes] = []
+        copied_to = 0
+        line_no = 1
+        counted_to = pos = search_pos = start
+        while match := char_map.NON_GENERAL_FORM_BYTES_REGEX.search(raw, search_pos):
+            if match.group() in self._excluded:
+                search_pos = match.end()
+                continue
+            line_start, line_end = _find_line(raw, pos, match.start())
+            line_no += _count_line_ends(raw, counted_to, line_start)
+            counted_to, pos = line_start, line_end
+            search_pos = line_end
+            if line_filter is not None and not line_filter(line_no):
+                continue
+            exit_code = ExitCode.FAIL
+
+            new_line, is_incomplete = self._normalize_line(
+                raw, line_start, line_end, line_no, reporter
+            )
+            if is_incomplete:
+                reporter.incomplete(line_no=line_no)
+            if new_line != raw[line_start:line_end]:
+                new_pieces += (raw[copied_to:line_start], new_line)
+                copied_to = line_end
+
+        if not new_pieces:
+            return exit_code, raw
+        new_pieces.append(raw[copied_to:])
+        return exit_code, b"".join(new_pieces)
+
+    def _normalize_line(
+        self, raw: bytes, start: int, end: int, line_no: int, reporter: Reporter
+    ) -> tuple[bytes, bool]:
+        """Apply the rules to a line, reporting every fixed and not fixed character.
+
+        Returns:
+            (bytes, bool): (The new line, True if a character is left not fixed).
+        """
+        new_pieces: list[bytes] = []
+        is_incomplete = False
+        copied_to = start
+        col_no = 1
+        for match in self._candidates.finditer(raw, start, end):
+            sequence = match.group()
+            if sequence in self._excluded:
+                continue
+            preceding = raw[copied_to : match.start()]
+            col_no += len(preceding.translate(None, _CONTINUATION_BYTES))
+            byte_fix = self._fixes.get(sequence)
+            if byte_fix is None:
+                character = sequence.decode("utf-8")
+                fix = Fix(col_no, character, character, "")
+                new_pieces += (preceding, sequence)
+                is_incomplete = True
+            else:
+                fix = Fix(
+                    col_no, byte_fix.original, byte_fix.replacement, byte_fix.rule_name
+                )
+                new_pieces += (preceding, byte_fix.new_bytes)
+                is_incomplete = is_incomplete or byte_fix.is_incomplete
+            reporter.fix(line_no=line_no, col_offset=0, fix=fix)
+            col_no += 1
+            copied_to = match.end()
+        new_pieces.append(raw[copied_to:end])
+        return b"".join(new_pieces), is_incomplete
+
+
+def _find_line(raw: bytes, line_start: int, pos: int) -> tuple[int, int]:
+    """Return where the line of a position starts, and where the next one starts.
+
+    Lines end after LF, and after a CR that is not followed by LF.
+
+    Args:
+        raw (bytes): The file.
+        line_start (int): The start of a line at, or before, the position.
+        pos (int): The position.
+
+    Returns:
+        (int, int): (The start of the line, The end of it, after its line ending).
+    """
+    line_start = max(
+        line_start,
+        raw.rfind(b"\n", line_start, pos) + 1,
+        raw.rfind(b"\r", line_start, pos) + 1,
+    )
+    lf = raw.find(b"\n", pos)
+    cr = raw.find(b"\r", pos)
+    if cr != -1 and (lf == -1 or cr < lf):
+        return line_start, cr + 2 if lf == cr + 1 else cr + 1
+    return line_start, len(raw) if lf == -1 else lf + 1
+
+
+def _count_line_ends(raw: bytes, start: int, end: int) -> int:
+    """Count the line endings between two line starts."""
+    return (
+        raw.count(b"\n", start, end)
+        + raw.count(b"\r", start, end)
+        - raw.count(b"\r\n", start, end)
+    )
+
+
+@functools.lru_cache
+def get_bytes_engine(engine: NormalizationEngine) -> BytesEngine:
+    """Return the bytes engine of compiled rules, built once per process.
+
+    Args:
+        engine (NormalizationEngine): The compiled rules.
+
+    Returns:
+        BytesEngine: The rules as UTF-8 sequences.
+    """
+    return BytesEngine(engine)
@@ -5,7 +5,9 @@ In Python so can make comments and still be valid.
 
 from __future__ import annotations
 
+import bisect
 import enum
+import re
 
 REMAP_RULE_TYPE = dict[str, dict[str, str]]
 CHAR_MAP_TYPE = dict[str, REMAP_RULE_TYPE]
@@ -87,43 +89,55 @@ class ArabicUnicodeGroup(enum.Enum):
     @classmethod
     def get_type(cls: type[ArabicUnicodeGroup], input_char: str) -> ArabicUnicodeGroup:
         """Return the Arabic Unicode Group."""
-        unicode_group = cls.Unknown
-        if "\u0600" <= input_char <= "\u06ff":
-            unicode_group = cls.Arabic
-        elif "\u0750" <= input_char <= "\u077f":
-            unicode_group = cls.ArabicSupplement
-        elif "\u0870" <= input_char <= "\u089f":
-            unicode_group = cls.ArabicExtendedB
-        elif "\u08a0" <= input_char <= "\u08ff":
-            unicode_group = cls.ArabicExtendedA
-        elif "\ufb50" <= input_char <= "\ufdff":
-            unicode_group = cls.ArabicPresentationFormsA
-        elif "\ufe70" <= input_char <= "\ufeff":
-            unicode_group = cls.ArabicPresentationFormsB
-        elif "\u10e60" <= input_char <= "\u10e7F":
-            unicode_group = cls.RumiNumeralSymbols
-        elif "\u10ec0" <= input_char <= "\u10efF":
-            unicode_group = cls.ArabicExtendedC
-        elif "\u1ec70" <= input_char <= "\u1ecbF":
-            unicode_group = cls.IndicSiyaqNumbers
-        elif "\u1ed00" <= input_char <= "\u1ed4F":
-            unicode_group = cls.OttomanSiyaqNumbers
-        elif "\u1ee00" <= input_char <= "\u1eefF":
-            unicode_group = cls.ArabicMathematicalAlphabeticSymbols
-
-        return unicode_group
-
-
-def is_contains_non_general_form(char: str) -> bool:
-    """True if the character is not generally supported."""
-    return ArabicUnicodeGroup.get_type(max(char)) not in {
-        ArabicUnicodeGroup.Unknown,
-        ArabicUnicodeGroup.Arabic,
-        ArabicUnicodeGroup.ArabicSupplement,
-        ArabicUnicodeGroup.ArabicExtendedB,
-        ArabicUnicodeGroup.ArabicExtendedC,
-        ArabicUnicodeGroup.RumiNumeralSymbols,
-        ArabicUnicodeGroup.IndicSiyaqNumbers,
-        ArabicUnicodeGroup.OttomanSiyaqNumbers,
-        ArabicUnicodeGroup.ArabicMathematicalAlphabeticSymbols,
+        codepoint = ord(input_char)
+        idx = bisect.bisect_right(_BLOCK_STARTS, codepoint) - 1
+        if idx >= 0 and codepoint <= _BLOCK_ENDS[idx]:
+            return _BLOCK_GROUPS[idx]
+        return cls.Unknown
+
+
+# (first codepoint, last codepoint, group), sorted by first codepoint.
+UNICODE_BLOCKS: tuple[tuple[int, int, ArabicUnicodeGroup], ...] = (
+    (0x0600, 0x06FF, ArabicUnicodeGroup.Arabic),
+    (0x0750, 0x077F, ArabicUnicodeGroup.ArabicSupplement),
+    (0x0870, 0x089F, ArabicUnicodeGroup.ArabicExtendedB),
+    (0x08A0, 0x08FF, ArabicUnicodeGroup.ArabicExtendedA),
+    (0xFB50, 0xFDFF, ArabicUnicodeGroup.ArabicPresentationFormsA),
+    (0xFE70, 0xFEFF, ArabicUnicodeGroup.ArabicPresentationFormsB),
+    (0x10E60, 0x10E7F, ArabicUnicodeGroup.RumiNumeralSymbols),
+    (0x10EC0, 0x10EFF, ArabicUnicodeGroup.ArabicExtendedC),
+    (0x1EC70, 0x1ECBF, ArabicUnicodeGroup.IndicSiyaqNumbers),
+    (0x1ED00, 0x1ED4F, ArabicUnicodeGroup.OttomanSiyaqNumbers),
+    (0x1EE00, 0x1EEFF, ArabicUnicodeGroup.ArabicMathematicalAlphabeticSymbols),
+)
+_BLOCK_STARTS = [start for start, _end, _group in UNICODE_BLOCKS]
+_BLOCK_ENDS = [end for _start, end, _group in UNICODE_BLOCKS]
+_BLOCK_GROUPS = [group for _start, _end, group in UNICODE_BLOCKS]
+
+NON_GENERAL_FORM_GROUPS = frozenset(
+    {
+        ArabicUnicodeGroup.ArabicExtendedA,
+        ArabicUnicodeGroup.ArabicPresentationFormsA,
+        ArabicUnicodeGroup.ArabicPresentationFormsB,
     }
+)
+"""Groups that are not generally supported, e.g. by fonts."""
+
+NON_GENERAL_FORM_RANGES = "".join(
+    f"{chr(start)}-{chr(end)}"
+    for start, end, group in UNICODE_BLOCKS
+    if group in NON_GENERAL_FORM_GROUPS
+)
+"""The :data:`NON_GENERAL_FORM_GROUPS` codepoints, for a regex character class."""
+NON_GENERAL_FORM_REGEX = re.compile(f"[{NON_GENERAL_FORM_RANGES}]")
+NON_GENERAL_FORM_BYTES_REGEX = re.compile(
+    rb"\xe0(?:\xa2[\xa0-\xbf]|\xa3[\x80-\xbf])"  # U+08A0 - U+08FF
+    rb"|\xef(?:\xad[\x90-\xbf]|[\xae-\xb7][\x80-\xbf])"  # U+FB50 - U+FDFF
+    rb"|\xef(?:\xb9[\xb0-\xbf]|[\xba\xbb][\x80-\xbf])"  # U+FE70 - U+FEFF
+)
+"""The UTF-8 encoding of :data:`NON_GENERAL_FORM_REGEX`, to check without decoding."""
+
+
+def is_contains_non_general_form(text: str) -> bool:
+    """True if any of the characters are not generally supported."""
+    return NON_GENERAL_FORM_REGEX.search(text) is not None
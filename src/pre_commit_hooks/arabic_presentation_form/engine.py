@@ -0,0 +1,624 @@
+"""Compiled normalization engine.
+
+The rules are regexes of single characters, so instead of trying every rule against
+every character we try every rule once against every character it could apply to,
+and keep the results in a table used with :meth:`str.translate`.
+
+Characters that no rule applies to fall back to the general form derived from their
+Unicode decomposition, see :mod:`.presentation_forms`.
+
+Rules may also match sequences of characters, e.g. a ligature written as its letters.
+Every sequence a rule matches is put in a trie, compiled into one regex together
+with the characters of the table, so a line is rewritten in a single pass however
+many rules there are.
+
+The table only depends on the rules, so it can be kept in a file and loaded by later
+runs instead of being built again.
+
+Excluded characters are compiled in as well, see :meth:`NormalizationEngine.excluding`:
+a set of characters is taken out of the table. Any other regex is matched on its own,
+only for lines with something to fix, and only the text between its matches is
+rewritten.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import os
+import pathlib
+import re
+import sys
+import unicodedata
+from collections.abc import Iterable, Iterator
+from typing import Any, NamedTuple
+
+from ..util import write_file_atomic
+from . import char_map
+from .presentation_forms import PRESENTATION_FORMS
+
+if sys.version_info >= (3, 11):
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+else:
+    import sre_constants
+    import sre_parse
+
+_CANDIDATE_CODEPOINTS = (*range(0xFB50, 0xFE00), *range(0xFE70, 0xFF00))
+_NON_GENERAL_FORM_BLOCKS = [
+    (start, end)
+    for start, end, group in char_map.UNICODE_BLOCKS
+    if group in char_map.NON_GENERAL_FORM_GROUPS
+]
+# Bounds the sequences of a rule, beyond that it only applies to single characters.
+_MAX_SEQUENCES_PER_RULE = 4096
+_MAX_SEQUENCE_REPEAT = 8
+
+# Bump when the table is built, or saved, differently: kept engines are then rebuilt.
+ENGINE_FORMAT_VERSION = 2
+
+SequencesDict = dict[str, tuple[str, str]]
+"""Sequence of characters -> (Replacement, Rule name)."""
+CompiledRules = list[tuple[str, re.Pattern[str], str]]
+"""(Rule name, Regex, Replacement), in the order they are tried."""
+
+
+class Fix(NamedTuple):
+    """A character, or sequence of characters, that was fixed or could not be."""
+
+    col_no: int
+    original: str
+    replacement: str
+    rule_name: str
+
+    @property
+    def is_fixed(self) -> bool:
+        """True if the character was replaced."""
+        return self.original != self.replacement
+
+
+class NormalizationEngine:
+    """Rules expanded once into a codepoint to replacement table."""
+
+    def __init__(self, custom_rules: char_map.CHAR_MAP_TYPE) -> None:
+        """Expand the inbuilt rules, updated by any custom rules, into a table.
+
+        Args:
+            custom_rules (char_map.CHAR_MAP_TYPE): Any additional rules to apply.
+        """
+        complete_rules: char_map.CHAR_MAP_TYPE = {}
+        complete_rules.update(char_map.CHAR_MAP)
+        complete_rules.update(custom_rules)
+        compiled_rules = [
+            (rule_name, re.compile(expected_regex), expected_out)
+            for rule_name, char_mapping_rule in complete_rules.items()
+            for expected_out, expected_regex in char_mapping_rule["rule"].items()
+        ]
+
+        # Overriding an inbuilt rule also takes its characters out of the fallback,
+        # so that a custom rule can stop them from being fixed.
+        overridden_patterns = [
+            re.compile(expected_regex)
+            for rule_name in char_map.CHAR_MAP.keys() & custom_rules.keys()
+            for expected_regex in char_map.CHAR_MAP[rule_name]["rule"].values()
+        ]
+
+        # The presentation forms, and every character a rule matches.
+        candidates = set(_CANDIDATE_CODEPOINTS)
+        expanded_rules = [(rule, enumerate_matches(rule[1])) for rule in compiled_rules]
+        for _rule, matches in expanded_rules:
+            candidates.update(ord(match) for match in matches or () if len(match) == 1)
+
+        table: dict[int, str] = {}
+        rule_names: dict[int, str] = {}
+        for codepoint in sorted(candidates):
+            character = chr(codepoint)
+            matched = _match_rules(compiled_rules, character)
+            if matched is not None:
+                new_char, rule_name = matched
+                if new_char != character:
+                    table[codepoint] = new_char
+                    rule_names[codepoint] = rule_name
+            elif codepoint in PRESENTATION_FORMS and not any(
+                pattern.match(character) for pattern in overridden_patterns
+            ):
+                table[codepoint] = PRESENTATION_FORMS[codepoint]
+                rule_names[codepoint] = unicodedata.name(character)
+
+        # The first rule wins, as for single characters.
+        sequences: SequencesDict = {}
+        for (rule_name, reg_pattern, replace_char), matches in expanded_rules:
+            for sequence in matches or ():
+                if len(sequence) > 1 and sequence not in sequences:
+                    new_sequence = reg_pattern.sub(replace_char, sequence)
+                    sequences[sequence] = (new_sequence, rule_name)
+
+        # Rules that could not be expanded, e.g. with \w, are tried against any other
+        # character when it is first met, so every rule is kept for that.
+        is_expanded = all(matches is not None for _rule, matches in expanded_rules)
+        self._set_table(
+            table, rule_names, sequences, rules=[] if is_expanded else compiled_rules
+        )
+
+    def _set_table(
+        self,
+        table: dict[int, str],
+        rule_names: dict[int, str],
+        sequences: SequencesDict,
+        excluded: frozenset[int] = frozenset(),
+        protected: re.Pattern[str] | None = None,
+        rules: CompiledRules | None = None,
+    ) -> None:
+        self._table = table
+        self._rule_names = rule_names
+        self._sequences = sequences
+        self._longest_sequence = max(map(len, sequences), default=1)
+        self._excluded = excluded
+        self._protected = protected
+        self._rules = rules or []
+        self._resolved: dict[int, tuple[str, str]] = {}
+        non_general_ranges = (
+            _character_class_ranges(_NON_GENERAL_FORM_BLOCKS, excluded)
+            if excluded
+            else char_map.NON_GENERAL_FORM_RANGES
+        )
+        self._non_general = re.compile(f"[{non_general_ranges}]")
+        if self._rules:  # Any character could be matched by a rule.
+            not_excluded = "".join(re.escape(chr(c)) for c in sorted(excluded))
+            self._candidates = re.compile(
+                f"[^{not_excluded}]" if excluded else "(?s:.)"
+            )
+        else:
+            replaceable = "".join(re.escape(chr(c)) for c in self._table)
+            self._candidates = re.compile(f"[{non_general_ranges}{replaceable}]")
+        # Sequences first, so they win over the characters they start with.
+        self._rewrite = (
+            re.compile(
+                f"(?P<sequence>{trie_pattern(sequences)})|{self._candidates.pattern}"
+            )
+            if sequences
+            else self._candidates
+        )
+        self._is_translation = not sequences and protected is None and not self._rules
+
+    @property
+    def table(self) -> dict[int, str]:
+        """The replacement of every codepoint that a rule changes."""
+        return self._table
+
+    @property
+    def rule_names(self) -> dict[int, str]:
+        """The rule that changes every codepoint in the table."""
+        return self._rule_names
+
+    @property
+    def sequences(self) -> SequencesDict:
+        """The replacement of every sequence of characters that a rule matches.
+
+        Only the python backend applies these, the others fall back to it.
+        """
+        return self._sequences
+
+    @property
+    def excluded(self) -> frozenset[int]:
+        """The codepoints left as they are, taken out of the table."""
+        return self._excluded
+
+    @property
+    def protected(self) -> re.Pattern[str] | None:
+        """The regex of excluded text that is not just a set of characters."""
+        return self._protected
+
+    @property
+    def is_table_only(self) -> bool:
+        """True if the table, less the excluded codepoints, is all there is to apply.
+
+        Only the python backend applies sequences, protected text and rules that could
+        not be expanded into the table, the others fall back to it.
+        """
+        return self._is_translation
+
+    def excluding(self, excluded_chars: str) -> NormalizationEngine:
+        """Return the engine that leaves the text matched by a regex as it is.
+
+        Args:
+            excluded_chars (str): The regex, e.g. ``(ﷺ)``. Empty to exclude nothing.
+
+        Returns:
+            NormalizationEngine: The engine, built once per process for each regex.
+        """
+        if not excluded_chars:
+            return self
+        return _get_excluding_engine(self, excluded_chars)
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the table, to save it.
+
+        Returns:
+            dict[str, Any]: The table, as JSON.
+        """
+        return {
+            "table": {str(cp): new_char for cp, new_char in self._table.items()},
+            "rule_names": {str(cp): name for cp, name in self._rule_names.items()},
+            "sequences": self._sequences,
+            "rules": [
+                [rule_name, reg_pattern.pattern, replace_char]
+                for rule_name, reg_pattern, replace_char in self._rules
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> NormalizationEngine:
+        """Return the engine of a saved table, without building it again.
+
+        Args:
+            data (dict[str, Any]): The table, as returned by :meth:`to_json`.
+
+        Returns:
+            NormalizationEngine: The engine.
+        """
+        engine = cls.__new__(cls)
+        engine._set_table(
+            {int(cp): str(new_char) for cp, new_char in data["table"].items()},
+            {int(cp): str(name) for cp, name in data["rule_names"].items()},
+            {
+                str(sequence): (str(new_sequence), str(rule_name))
+                for sequence, (new_sequence, rule_name) in data["sequences"].items()
+            },
+            rules=[
+                (str(rule_name), re.compile(str(regex)), str(replace_char))
+                for rule_name, regex, replace_char in data["rules"]
+            ],
+        )
+        return engine
+
+    def normalize(self, line: str) -> tuple[str, list[Fix]]:
+        """Apply the rules to a line.
+
+        Args:
+            line (str): Line to apply the rules to.
+
+        Returns:
+            (str, list[Fix]): (The new line, The fixed and not fixed characters).
+                The line is left as it is, with no fixes, if it has no characters
+                that are not generally supported outside of the excluded text.
+        """
+        fixes: list[Fix] = []
+        if self._non_general.search(line) is None:
+            return line, fixes
+        if self._is_translation:
+            for match in self._candidates.finditer(line):
+                self._add_fix(match, fixes)
+            return line.translate(self._table), fixes
+
+        new_pieces: list[str] = []
+        copied_to = 0
+        for start, end in self._unprotected_spans(line):
+            for match in self._rewrite.finditer(line, start, end):
+                replacement = self._add_fix(match, fixes)
+                new_pieces += (line[copied_to : match.start()], replacement)
+                copied_to = match.end()
+        if not any(self._non_general.search(fix.original) for fix in fixes):
+            return line, []
+        new_pieces.append(line[copied_to:])
+        return "".join(new_pieces), fixes
+
+    def split_point(self, text: str) -> int:
+        """Return where the start of a line can be cut off, to normalize it alone.
+
+        The cut is never inside a sequence, nor where one could start and end in
+        the rest of the line.
+
+        Args:
+            text (str): The start of the line read so far.
+
+        Returns:
+            int: How much of the text can be normalized without the rest of the
+                line, 0 if none. Always 0 with protected text, as it could be of
+                any length.
+        """
+        if self._protected is not None:
+            return 0
+        split = len(text) - self._longest_sequence + 1
+        if split <= 0 or not self._sequences:
+            return max(split, 0)
+        for match in self._rewrite.finditer(text):
+            if match.start() >= split:
+                break
+            if match.end() > split:
+                return match.start()
+        return split
+
+    def _unprotected_spans(self, line: str) -> Iterator[tuple[int, int]]:
+        """Yield the (start, end) of the text between the protected matches."""
+        start = 0
+        if self._protected is not None:
+            for match in self._protected.finditer(line):
+                if match.end() > match.start():
+                    yield start, match.start()
+                    start = match.end()
+        yield start, len(line)
+
+    def _add_fix(self, match: re.Match[str], fixes: list[Fix]) -> str:
+        """Return the replacement of a match, adding it to the fixes if reported."""
+        original = match.group()
+        if match.lastgroup == "sequence":
+            replacement, rule_name = self._sequences[original]
+        else:
+            replacement, rule_name = self._lookup(ord(original))
+        if replacement != original or char_map.is_contains_non_general_form(
+            replacement
+        ):
+            fixes.append(Fix(match.start() + 1, original, replacement, rule_name))
+        return replacement
+
+    def _lookup(self, codepoint: int) -> tuple[str, str]:
+        """Return the replacement of a character, and the rule that changes it."""
+        if codepoint in self._table:
+            return self._table[codepoint], self._rule_names.get(codepoint, "")
+        if not self._rules or codepoint in self._excluded:
+            return chr(codepoint), ""
+        if codepoint not in self._resolved:
+            character = chr(codepoint)
+            matched = _match_rules(self._rules, character)
+            self._resolved[codepoint] = (
+                (character, "")
+                if matched is None or matched[0] == character
+                else matched
+            )
+        return self._resolved[codepoint]
+
+
+def _match_rules(rules: CompiledRules, character: str) -> tuple[str, str] | None:
+    """Return the replacement of a character by the first rule that matches it.
+
+    Returns:
+        tuple[str, str] | None: (The replacement, The rule name). None if no rule
+            matches the character.
+    """
+    for rule_name, reg_pattern, replace_char in rules:
+        if reg_pattern.match(character):
+            return reg_pattern.sub(replace_char, character), rule_name
+    return None
+
+
+@functools.lru_cache
+def _get_excluding_engine(
+    engine: NormalizationEngine, excluded_chars: str
+) -> NormalizationEngine:
+    protected = re.compile(excluded_chars)
+    matches = enumerate_matches(protected)
+    excluding = NormalizationEngine.__new__(NormalizationEngine)
+    if matches is not None and all(len(match) <= 1 for match in matches):
+        excluded = frozenset(ord(match) for match in matches if match)
+        excluding._set_table(
+            {cp: c for cp, c in engine.table.items() if cp not in excluded},
+            {cp: n for cp, n in engine.rule_names.items() if cp not in excluded},
+            {
+                sequence: replacement
+                for sequence, replacement in engine.sequences.items()
+                if excluded.isdisjoint(map(ord, sequence))
+            },
+            excluded=excluded,
+            rules=engine._rules,
+        )
+    else:
+        excluding._set_table(
+            engine.table,
+            engine.rule_names,
+            engine.sequences,
+            protected=protected,
+            rules=engine._rules,
+        )
+    return excluding
+
+
+def _character_class_ranges(
+    blocks: Iterable[tuple[int, int]], excluded: frozenset[int]
+) -> str:
+    """Return the codepoints of the blocks, less the excluded ones, as class ranges."""
+    ranges = []
+    for block_start, block_end in blocks:
+        start = block_start
+        for codepoint in sorted(
+            cp for cp in excluded if block_start <= cp <= block_end
+        ):
+            if start < codepoint:
+                ranges.append(f"{chr(start)}-{chr(codepoint - 1)}")
+            start = codepoint + 1
+        if start <= block_end:
+            ranges.append(f"{chr(start)}-{chr(block_end)}")
+    return "".join(ranges)
+
+
+def enumerate_matches(pattern: re.Pattern[str]) -> list[str] | None:
+    """Return every string a regex matches, if there are few of them.
+
+    Args:
+        pattern (re.Pattern[str]): The regex.
+
+    Returns:
+        list[str] | None: The strings, in the order the regex tries them. None if the
+            regex matches too many strings, or has constructs that are not
+            expanded, e.g. unbounded repeats, flags or lookarounds.
+    """
+    if pattern.flags & ~re.UNICODE:
+        return None
+    try:
+        return _expand(sre_parse.parse(pattern.pattern).data)
+    except _TooManyMatchesError:
+        return None
+
+
+class _TooManyMatchesError(Exception):
+    pass
+
+
+def _expand(items: Iterable[tuple[Any, Any]]) -> list[str] | None:
+    matches = [""]
+    for op, av in items:
+        options = _expand_item(op, av)
+        if options is None:
+            return None
+        matches = [match + option for match in matches for option in options]
+        if len(matches) > _MAX_SEQUENCES_PER_RULE:
+            raise _TooManyMatchesError
+    return matches
+
+
+def _expand_item(op: Any, av: Any) -> list[str] | None:
+    if op is sre_constants.LITERAL:
+        return [chr(av)]
+    if op is sre_constants.IN:
+        characters = []
+        for item_op, item_av in av:
+            if item_op is sre_constants.LITERAL:
+                characters.append(chr(item_av))
+            elif item_op is sre_constants.RANGE:
+                low, high = item_av
+                if high - low > _MAX_SEQUENCES_PER_RULE:
+                    raise _TooManyMatchesError
+                characters.extend(map(chr, range(low, high + 1)))
+            else:  # e.g. negated sets, or categories such as \w
+                return None
+        return characters
+    if op is sre_constants.SUBPATTERN:
+        _group, add_flags, del_flags, subpattern = av
+        return None if add_flags or del_flags else _expand(subpattern)
+    if op is sre_constants.BRANCH:
+        _, branches = av
+        options = []
+        for branch in branches:
+            branch_options = _expand(branch)
+            if branch_options is None:
+                return None
+            options.extend(branch_options)
+        return options
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        low, high, subpattern = av
+        repeated = _expand(subpattern)
+        if repeated is None or high > _MAX_SEQUENCE_REPEAT:
+            return None
+        counts = range(high, low - 1, -1)  # Greedy, the longest first.
+        if op is sre_constants.MIN_REPEAT:
+            counts = range(low, high + 1)
+        options = []
+        for count in counts:
+            products = [""]
+            for _ in range(count):
+                products = [
+                    product + option for product in products for option in repeated
+                ]
+                if len(products) > _MAX_SEQUENCES_PER_RULE:
+                    raise _TooManyMatchesError
+            options.extend(products)
+        return options
+    return None
+
+
+def trie_pattern(strings: Iterable[str]) -> str:
+    """Return a regex of the strings, factored by their prefixes as a trie.
+
+    Trying the regex costs as much as the longest string, not as the number of
+    strings, and it matches the longest string it can.
+
+    Args:
+        strings (Iterable[str]): The strings.
+
+    Returns:
+        str: The regex.
+    """
+    trie: dict[str, Any] = {}
+    for string in strings:
+        node = trie
+        for character in string:
+            node = node.setdefault(character, {})
+        node[""] = {}  # A string ends here.
+    return _trie_node_pattern(trie)
+
+
+def _trie_node_pattern(node: dict[str, Any]) -> str:
+    branches = [
+        re.escape(character) + _trie_node_pattern(child)
+        for character, child in sorted(node.items())
+        if character
+    ]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # Greedy, so the longer strings are tried first.
+    return f"(?:{pattern})?" if "" in node else pattern
+
+
+def rules_fingerprint(custom_rules: char_map.CHAR_MAP_TYPE) -> str:
+    """Identify a set of rules, the inbuilt ones and any custom ones.
+
+    The version of the package, and of the engine format, are included, so an
+    engine kept by an older version is not loaded by a newer one.
+
+    Args:
+        custom_rules (char_map.CHAR_MAP_TYPE): Any additional rules to apply.
+
+    Returns:
+        str: The fingerprint.
+    """
+    import hashlib
+
+    from ..__about__ import __version__
+
+    # Rule order matters, the first matching rule wins, so the keys are not sorted.
+    return hashlib.blake2b(
+        json.dumps(
+            [
+                __version__,
+                ENGINE_FORMAT_VERSION,
+                char_map.CHAR_MAP,
+                PRESENTATION_FORMS,
+                custom_rules,
+            ],
+            ensure_ascii=False,
+        ).encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def get_engine(
+    custom_rules: char_map.CHAR_MAP_TYPE, cache_dir: str | None = None
+) -> NormalizationEngine:
+    """Return the engine for the given custom rules, built once per process.
+
+    Args:
+        custom_rules (char_map.CHAR_MAP_TYPE): Any additional rules to apply.
+        cache_dir (str | None): Keep the engine in this directory, so later runs
+            load it instead of building it. Defaults to None.
+
+    Returns:
+        NormalizationEngine: The compiled rules.
+    """
+    return _get_engine(json.dumps(custom_rules, ensure_ascii=False), cache_dir)
+
+
+@functools.lru_cache
+def _get_engine(custom_rules_json: str, cache_dir: str | None) -> NormalizationEngine:
+    custom_rules: char_map.CHAR_MAP_TYPE = json.loads(custom_rules_json)
+    if not cache_dir:
+        return NormalizationEngine(custom_rules)
+
+    cache_file = (
+        pathlib.Path(cache_dir) / f"engine-{rules_fingerprint(custom_rules)}.json"
+    )
+    try:
+        with cache_file.open(encoding="utf-8") as fp:
+            return NormalizationEngine.from_json(json.load(fp))
+    except (OSError, ValueError, KeyError, AttributeError, TypeError):  # e.g. corrupt
+        pass
+
+    engine = NormalizationEngine(custom_rules)
+    with contextlib.suppress(OSError):  # The cache is only an optimization.
+        os.makedirs(cache_file.parent, exist_ok=True)
+        write_file_atomic(
+            cache_file,
+            json.dumps(engine.to_json(), ensure_ascii=False).encode("utf-8"),
+        )
+    return engine
@@ -0,0 +1,96 @@
+"""Generate :mod:`.presentation_forms` from the Unicode database of this Python.
+
+Run again when a newer Python has a newer Unicode version::
+
+    python -m pre_commit_hooks.arabic_presentation_form.generate
+"""
+
+from __future__ import annotations
+
+import pathlib
+import unicodedata
+
+from . import char_map
+
+MODULE_FILE = pathlib.Path(__file__).with_name("presentation_forms.py")
+
+# The positional forms, the only decompositions of the presentation form blocks.
+_FORM_TAGS = frozenset({"<initial>", "<medial>", "<final>", "<isolated>"})
+# Ligatures of whole words and phrases, e.g. Allah, and Koranic stop signs.
+_WORD_LIGATURES = range(0xFDF0, 0xFDFC)
+
+
+def generate_presentation_forms() -> dict[int, str]:
+    """Derive the general form of every presentation form, from its decomposition.
+
+    Ligatures of words or phrases (U+FDF0 - U+FDFB, e.g. U+FDF2 Allah), forms that
+    decompose to a space and a mark, and forms that are symbols (e.g. U+FDFC) are
+    left out: they are not just another form of their letters.
+
+    Returns:
+        dict[int, str]: The general form of every presentation form, by codepoint.
+    """
+    presentation_forms = {}
+    for start, end, group in char_map.UNICODE_BLOCKS:
+        if group not in {
+            char_map.ArabicUnicodeGroup.ArabicPresentationFormsA,
+            char_map.ArabicUnicodeGroup.ArabicPresentationFormsB,
+        }:
+            continue
+        for codepoint in range(start, end + 1):
+            character = chr(codepoint)
+            tag, _, decomposition = unicodedata.decomposition(character).partition(" ")
+            parts = decomposition.split()
+            if (
+                tag in _FORM_TAGS
+                and codepoint not in _WORD_LIGATURES
+                and "0020" not in parts
+                and unicodedata.category(character) == "Lo"
+            ):
+                presentation_forms[codepoint] = "".join(
+                    chr(int(part, 16)) for part in parts
+                )
+    return presentation_forms
+
+
+def format_module(presentation_forms: dict[int, str]) -> str:
+    """Return the source of the module with the presentation forms.
+
+    Args:
+        presentation_forms (dict[int, str]): As from generate_presentation_forms.
+
+    Returns:
+        str: The source.
+    """
+    lines = [
+        '"""Presentation forms and their general form, from Unicode decompositions.',
+        "",
+        "Generated by :mod:`.generate`, do not edit.",
+        '"""',
+        "",
+        "from __future__ import annotations",
+        "",
+        f'UNIDATA_VERSION = "{unicodedata.unidata_version}"',
+        "",
+        "# ruff: noqa: E501",
+        "# fmt: off",
+        "PRESENTATION_FORMS: dict[int, str] = {",
+    ]
+    for codepoint, general_form in sorted(presentation_forms.items()):
+        escaped = "".join(f"\\u{ord(c):04x}" for c in general_form)
+        name = unicodedata.name(chr(codepoint))
+        lines.append(f'    0x{codepoint:04X}: "{escaped}",  # {name}')
+    lines += ["}", "# fmt: on", ""]
+    return "\n".join(lines)
+
+
+def main() -> int:
+    """Main entrypoint."""
+    MODULE_FILE.write_text(
+        format_module(generate_presentation_forms()), encoding="utf-8"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+"""Reporting of fixes."""
+
+from __future__ import annotations
+
+import collections
+import pathlib
+import sys
+import typing
+
+from .engine import Fix
+
+# Bounds the memory held for files with a lot of reports, e.g. when streamed.
+_MAX_BUFFERED_REPORTS = 4096
+
+
+class _FixReport(typing.NamedTuple):
+    line_no: int
+    col_no: int
+    fix: Fix
+
+    def format(self, file_name: pathlib.Path | str) -> str:
+        new_c_as_unicode_hex = [f"\\u{ord(c):04x}" for c in self.fix.replacement]
+        return (
+            f"[{'Fixed' if self.fix.is_fixed else 'Not Fixed'}]"
+            f" {file_name}:{self.line_no}:{self.col_no}"
+            f" [{self.fix.replacement} ({new_c_as_unicode_hex})]"
+        )
+
+
+class _IncompleteReport(typing.NamedTuple):
+    line_no: int
+
+    def format(self, file_name: pathlib.Path | str) -> str:
+        return f"Incomplete Fixes Applied: {file_name}:{self.line_no}"
+
+
+class Reporter:
+    """Collects the reports of a file, to write them all at once.
+
+    The report messages are only made when they are written, so reports that are
+    capped, or only counted for a summary, cost little more than a tuple.
+    """
+
+    def __init__(
+        self,
+        file_name: pathlib.Path | str,
+        summary: bool = False,
+        max_reports: int | None = None,
+    ) -> None:
+        """Initialize an empty report.
+
+        Args:
+            file_name (pathlib.Path | str): the name of the file being checked.
+            summary (bool): Only write the counts per rule. Defaults to False.
+            max_reports (int | None): Most reports to write. Defaults to no limit.
+        """
+        self.file_name = file_name
+        self.summary = summary
+        self.max_reports = max_reports
+        self._reports: list[_FixReport | _IncompleteReport] = []
+        self._n_written = 0
+        self._n_hidden = 0
+        self._counts: collections.Counter[tuple[str, str]] = collections.Counter()
+
+    def fix(self, line_no: int, col_offset: int, fix: Fix) -> None:
+        """Report a fixed, or not fixed, character.
+
+        Args:
+            line_no (int): The line number of the character.
+            col_offset (int): Columns before the start of the text the fix is for.
+            fix (Fix): The fix.
+        """
+        if self.summary:
+            status = "Fixed" if fix.is_fixed else "Not Fixed"
+            rule = fix.rule_name or f"U+{ord(fix.original):04X}"
+            self._counts[(status, rule)] += 1
+        else:
+            self._add(_FixReport(line_no, fix.col_no + col_offset, fix))
+
+    def incomplete(self, line_no: int) -> None:
+        """Report a line that still has characters not in their general form.
+
+        Args:
+            line_no (int): The line number.
+        """
+        if self.summary:
+            self._counts[("Incomplete", "lines")] += 1
+        else:
+            self._add(_IncompleteReport(line_no))
+
+    def _add(self, report: _FixReport | _IncompleteReport) -> None:
+        if self.max_reports is not None and (
+            self._n_written + len(self._reports) >= self.max_reports
+        ):
+            self._n_hidden += 1
+            return
+        self._reports.append(report)
+        if len(self._reports) >= _MAX_BUFFERED_REPORTS:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything reported so far."""
+        lines = [report.format(self.file_name) for report in self._reports]
+        self._n_written += len(self._reports)
+        self._reports.clear()
+        if self._n_hidden:
+            lines.append(
+                f"{self.file_name}: {self._n_hidden} more reports not shown"
+                f" (--max-reports {self.max_reports})"
+            )
+            self._n_hidden = 0
+        if self._counts:
+            lines.append(f"{self.file_name}: {self._format_counts()}")
+            lines.extend(
+                f"  [{status}] {rule}: {count}"
+                for (status, rule), count in sorted(self._counts.items())
+            )
+            self._counts.clear()
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+
+    def _format_counts(self) -> str:
+        totals: collections.Counter[str] = collections.Counter()
+        for (status, _rule), count in self._counts.items():
+            totals[status] += count
+        return ", ".join(
+            f"{totals[status]} {status}"
+            for status in ("Fixed", "Not Fixed", "Incomplete")
+            if totals[status]
+        )
@@ -0,0 +1,196 @@
+"""Vectorized normalization engine, with NumPy.
+
+Instead of a loop over the characters of every line, a whole text is classified,
+and mapped, at once as an array of codepoints. Only the lines with something to
+fix, and the fixes themselves, are visited one at a time for their reports.
+
+NumPy is an optional dependency, see :func:`get_vectorized_engine`.
+"""
+
+from __future__ import annotations
+
+import functools
+from collections.abc import Callable
+
+import numpy as np
+import numpy.typing as npt
+
+from ..util import ExitCode
+from . import char_map
+from .engine import Fix, NormalizationEngine
+from .report import Reporter
+
+_LF = ord("\n")
+_CR = ord("\r")
+
+_BLOCK_STARTS = np.array([start for start, _end, _group in char_map.UNICODE_BLOCKS])
+_BLOCK_ENDS = np.array([end for _start, end, _group in char_map.UNICODE_BLOCKS])
+_BLOCK_IS_NON_GENERAL = np.array(
+    [
+        group in char_map.NON_GENERAL_FORM_GROUPS
+        for *_range, group in char_map.UNICODE_BLOCKS
+    ]
+)
+
+
+def classify(codepoints: npt.NDArray[np.uint32]) -> npt.NDArray[np.intp]:
+    """Return the block of every codepoint, like ArabicUnicodeGroup.get_type.
+
+    Args:
+        codepoints (npt.NDArray[np.uint32]): The codepoints.
+
+    Returns:
+        npt.NDArray[np.intp]: The index in char_map.UNICODE_BLOCKS of every codepoint,
+            -1 if it is in none of them.
+    """
+    blocks = np.searchsorted(_BLOCK_STARTS, codepoints, side="right") - 1
+    in_block = (blocks >= 0) & (codepoints <= _BLOCK_ENDS[blocks])
+    return np.where(in_block, blocks, -1)
+
+
+def is_non_general_form(codepoints: npt.NDArray[np.uint32]) -> npt.NDArray[np.bool_]:
+    """Return which codepoints are not generally supported.
+
+    Args:
+        codepoints (npt.NDArray[np.uint32]): The codepoints.
+
+    Returns:
+        npt.NDArray[np.bool_]: True for the codepoints in the groups of
+            char_map.NON_GENERAL_FORM_GROUPS.
+    """
+    blocks = classify(codepoints)
+    is_non_general: npt.NDArray[np.bool_] = (blocks >= 0) & _BLOCK_IS_NON_GENERAL[
+        blocks
+    ]
+    return is_non_general
+
+
+class VectorizedEngine:
+    """The table of a NormalizationEngine, as lookup arrays."""
+
+    def __init__(self, engine: NormalizationEngine) -> None:
+        """Lay out the table of the engine as arrays.
+
+        Args:
+            engine (NormalizationEngine): The compiled rules, with no sequences or
+                protected text, see NormalizationEngine.is_table_only.
+        """
+        self._excluded = np.array(sorted(engine.excluded), dtype=np.uint32)
+        entries = sorted(engine.table.items())
+        self._originals = [chr(codepoint) for codepoint, _new_char in entries]
+        self._replacements = [new_char for _codepoint, new_char in entries]
+        self._rule_names = [engine.rule_names.get(cp, "") for cp, _new_char in entries]
+
+        # Codepoint -> entry, the last codepoint is past every rule and has none.
+        max_codepoint = max((codepoint for codepoint, _ in entries), default=0)
+        self._lookup = np.full(max_codepoint + 2, -1, dtype=np.intp)
+        self._lookup[[codepoint for codepoint, _ in entries]] = np.arange(len(entries))
+
+        # Entry -> replacement codepoints, padded to the longest replacement.
+        self._lengths = np.array(
+            [len(new_char) for new_char in self._replacements], dtype=np.intp
+        )
+        self._targets = np.zeros(
+            (len(entries), max(self._lengths, default=0)), dtype=np.uint32
+        )
+        for entry, new_char in enumerate(self._replacements):
+            self._targets[entry, : len(new_char)] = [ord(c) for c in new_char]
+        self._is_incomplete = [
+            char_map.is_contains_non_general_form(new_char)
+            for new_char in self._replacements
+        ]
+
+    def normalize_text(
+        self,
+        text: str,
+        reporter: Reporter,
+        line_filter: Callable[[int], bool] | None = None,
+    ) -> tuple[ExitCode, str]:
+        """Apply the rules to a text, like normalize_line_pieces does to its lines.
+
+        Args:
+            text (str): The text to apply the rules to.
+            reporter (Reporter): Collects the reports for the file being checked.
+            line_filter (Callable[[int], bool] | None): Only check the lines, by their
+                number, that this is True for. Defaults to checking every line.
+
+        Returns:
+            (ExitCode, str): (The PASS/FAIL state, The new text).
+        """
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+        non_general = is_non_general_form(codepoints)
+        if len(self._excluded):
+            non_general &= ~np.isin(codepoints, self._excluded)
+        if not non_general.any():
+            return ExitCode.OK, text
+        entries = self._lookup[np.minimum(codepoints, len(self._lookup) - 1)]
+        fix_positions = np.flatnonzero(non_general | (entries >= 0))
+
+        # Lines end after "\n", and after a "\r" that is not followed by "\n".
+        line_ends = codepoints == _LF
+        line_ends[:-1] |= (codepoints[:-1] == _CR) & (codepoints[1:] != _LF)
+        line_ends[-1] |= codepoints[-1] == _CR
+        line_of = np.cumsum(line_ends) - line_ends
+        line_starts = [0, *(np.flatnonzero(line_ends) + 1).tolist(), len(text)]
+        fix_lines = line_of[fix_positions]
+
+        exit_code = ExitCode.OK
+        checked = np.zeros(len(codepoints), dtype=np.bool_)
+        for line in np.unique(line_of[non_general]).tolist():
+            line_no = line + 1
+            if line_filter is not None and not line_filter(line_no):
+                continue
+            start, end = line_starts[line], line_starts[line + 1]
+            exit_code = ExitCode.FAIL
+            checked[start:end] = True
+
+            is_incomplete = False
+            first, last = np.searchsorted(fix_lines, [line, line + 1]).tolist()
+            for pos in fix_positions[first:last].tolist():
+                entry = int(entries[pos])
+                if entry < 0:
+                    fix = Fix(pos - start + 1, text[pos], text[pos], "")
+                    is_incomplete = True
+                else:
+                    fix = Fix(
+                        pos - start + 1,
+                        self._originals[entry],
+                        self._replacements[entry],
+                        self._rule_names[entry],
+                    )
+                    is_incomplete = is_incomplete or self._is_incomplete[entry]
+                reporter.fix(line_no=line_no, col_offset=0, fix=fix)
+            if is_incomplete:
+                reporter.incomplete(line_no=line_no)
+
+        rewritten = np.flatnonzero(checked & (entries >= 0))
+        if not len(rewritten):
+            return exit_code, text
+        # Every codepoint is repeated as often as its replacement is long, and the
+        # repeats of the rewritten ones are overwritten with their replacement.
+        counts = np.ones(len(codepoints), dtype=np.intp)
+        counts[rewritten] = self._lengths[entries[rewritten]]
+        new_codepoints = np.repeat(codepoints, counts)
+        new_starts = (np.cumsum(counts) - counts)[rewritten]
+        for idx in range(self._targets.shape[1]):
+            has_idx = counts[rewritten] > idx
+            new_codepoints[new_starts[has_idx] + idx] = self._targets[
+                entries[rewritten[has_idx]], idx
+            ]
+        return exit_code, new_codepoints.tobytes().decode("utf-32-le")
+
+
+@functools.lru_cache
+def get_vectorized_engine(engine: NormalizationEngine) -> VectorizedEngine:
+    """Return the vectorized engine of compiled rules, built once per process.
+
+    Importing this module raises ImportError without NumPy, for callers to fall
+    back to the engine itself.
+
+    Args:
+        engine (NormalizationEngine): The compiled rules.
+
+    Returns:
+        VectorizedEngine: The rules as lookup arrays.
+    """
+    return VectorizedEngine(engine)
@@ -0,0 +1,109 @@
+"""Cache of the files that passed a hook, shared between runs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import time
+
+from .util import write_file_atomic
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ResultCache:
+    """Remembers which files passed a hook.
+
+    An entry is keyed by the hook's fingerprint (its name, version and effective
+    arguments) and by either the content of the file or its size, mtime and inode.
+    So any change to the file or to the configuration is a cache miss. The cache
+    is a JSON file of ``{key: last used time}``, the least recently used entries
+    are evicted when there are more than ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        cache_file: pathlib.Path,
+        fingerprint: str,
+        max_entries: int,
+        by_stat: bool = False,
+    ) -> None:
+        """Load the cache.
+
+        Args:
+            cache_file (pathlib.Path): The JSON file to keep the cache in.
+            fingerprint (str): Identifies the hook and its configuration.
+            max_entries (int): How many entries to keep at most.
+            by_stat (bool): Key files by their size, mtime and inode instead of by
+                their content. Defaults to False.
+        """
+        self.cache_file = cache_file
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.by_stat = by_stat
+        self._entries = self._load()
+        self._new_entries: dict[str, float] = {}
+
+    def _load(self) -> dict[str, float]:
+        try:
+            with self.cache_file.open(encoding="utf-8") as fp:
+                entries = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def key(self, file_name: pathlib.Path) -> str | None:
+        """Return the cache key of a file.
+
+        Args:
+            file_name (pathlib.Path): The file.
+
+        Returns:
+            str | None: The key, None if the file could not be read.
+        """
+        digest = hashlib.blake2b(self.fingerprint.encode(), digest_size=20)
+        try:
+            if self.by_stat:
+                stat = file_name.stat()
+                digest.update(
+                    f"{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}".encode()
+                )
+            else:
+                with file_name.open("rb") as fp:
+                    while chunk := fp.read(_HASH_CHUNK_SIZE):
+                        digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def is_ok(self, key: str | None) -> bool:
+        """True if the file with this key passed before."""
+        if key is None or key not in self._entries:
+            return False
+        self._new_entries[key] = time.time()
+        return True
+
+    def add(self, key: str | None) -> None:
+        """Remember that the file with this key passed."""
+        if key is not None:
+            self._new_entries[key] = time.time()
+
+    def save(self) -> None:
+        """Write the cache, merged with what other processes saved meanwhile."""
+        if not self._new_entries:
+            return
+        entries = self._load()
+        entries.update(self._new_entries)
+        if len(entries) > self.max_entries:
+            # Not [-max_entries:], which keeps every entry for a maximum of 0.
+            entries = dict(
+                sorted(entries.items(), key=lambda item: item[1])[
+                    len(entries) - self.max_entries :
+                ]
+            )
+        os.makedirs(self.cache_file.parent, exist_ok=True)
+        write_file_atomic(self.cache_file, json.dumps(entries).encode("utf-8"))
+        self._entries = entries
+        self._new_entries = {}
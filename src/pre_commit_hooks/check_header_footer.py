@@ -5,52 +5,313 @@ from __future__ import annotations
 import functools
 import io
 import json
+import mmap
 import pathlib
 import re
+import sys
+import typing
 from collections.abc import Sequence
 from typing import Any, NamedTuple
 
+from .diff import ChangedLines, add_diff_argument
+from .profiling import span
 from .util import (
     ABCArgs,
     ABCHook,
     ExitCode,
+    find_nth_line_before_end,
     move_file_pointer_to_nth_line_before_end,
     sanitize_rb_line,
 )
 
 RulesDict = dict[str, re.Pattern[Any]]
+# A whole file, mapped or read.
+Buffer = bytes | mmap.mmap
+
+_LINES_PER_SEARCH = 8
+
+# In the text of a file the trailing whitespace of every line is removed.
+_BYTES_NEWLINE = rb"[ \t\r\f\v]*\n"
+
+
+def _to_bytes_pattern(rule: re.Pattern[Any]) -> re.Pattern[bytes] | None:
+    """Convert a rule, as RuleConfig makes them, to match the UTF-8 bytes of a file.
+
+    Args:
+        rule (re.Pattern): The rule to convert.
+
+    Returns:
+        re.Pattern[bytes] | None: The rule for bytes, None if it cannot be converted.
+    """
+    if isinstance(rule.pattern, bytes):
+        return rule
+    try:
+        return re.compile(
+            _BYTES_NEWLINE.join(
+                part.encode("utf-8") for part in rule.pattern.split(re.escape("\n"))
+            ),
+            rule.flags & ~re.UNICODE,
+        )
+    except (re.error, ValueError):
+        return None
+
+
+class RuleMatcher:
+    """Finds every rule with a single pass over the text.
+
+    The rules are combined into one alternation of named groups. As matches of an
+    alternation do not overlap, a rule that was not found in the pass is searched
+    for on its own, so that a rule overlapping with another is still found.
+    """
+
+    def __init__(self, rules: RulesDict) -> None:
+        """Combine the rules.
+
+        Args:
+            rules (RulesDict): The rules to find.
+        """
+        self.rules = rules
+        # The most lines a rule spans, so a text can be searched a few lines at a time.
+        self.max_lines = 1 + max(
+            (_count_newlines(r.pattern) for r in rules.values()), default=0
+        )
+        self._group_names = {f"r{idx}": name for idx, name in enumerate(rules)}
+        self._combined: re.Pattern[Any] | None = None
+        flags = {rule.flags for rule in rules.values()}
+        if len(flags) == 1:
+            try:
+                self._combined = re.compile(
+                    _join_named_groups(
+                        {
+                            group_name: rules[name].pattern
+                            for group_name, name in self._group_names.items()
+                        }
+                    ),
+                    flags.pop(),
+                )
+            except (re.error, TypeError):  # e.g. global inline flags, mixed types
+                pass
+
+    @functools.cached_property
+    def bytes_matcher(self) -> RuleMatcher | None:
+        """The matcher for the UTF-8 bytes of a file, None if a rule cannot be made."""
+        bytes_rules = {
+            name: _to_bytes_pattern(rule) for name, rule in self.rules.items()
+        }
+        if any(rule is None for rule in bytes_rules.values()):
+            return None
+        return RuleMatcher(typing.cast(RulesDict, bytes_rules))
+
+    def find(
+        self, text: str | bytes | mmap.mmap, pos: int = 0, endpos: int = sys.maxsize
+    ) -> set[str]:
+        """Return the names of the rules that are in the text.
+
+        Args:
+            text (str | bytes | mmap.mmap): The text to search, bytes for a
+                matcher of bytes rules.
+            pos (int): Where to start searching. Defaults to 0.
+            endpos (int): Where to stop searching. Defaults to the end.
+
+        Returns:
+            set[str]: The names of the rules found.
+        """
+        found: set[str] = set()
+        if self._combined is not None:
+            for match in self._combined.finditer(text, pos, endpos):
+                found.add(self._group_names[match.lastgroup or ""])
+                if len(found) == len(self.rules):
+                    return found
+        found.update(
+            name
+            for name, rule in self.rules.items()
+            if name not in found and rule.search(text, pos, endpos)
+        )
+        return found
+
+    def missing(
+        self, text: str | bytes | mmap.mmap, pos: int = 0, endpos: int = sys.maxsize
+    ) -> list[str]:
+        """Return the names of the rules that are not in the text.
+
+        Args:
+            text (str | bytes | mmap.mmap): The text to search.
+            pos (int): Where to start searching. Defaults to 0.
+            endpos (int): Where to stop searching. Defaults to the end.
+
+        Returns:
+            list[str]: The names of the rules not found, in the order of the rules.
+        """
+        found = self.find(text, pos, endpos)
+        return [name for name in self.rules if name not in found]
+
+
+def _count_newlines(pattern: str | bytes) -> int:
+    if isinstance(pattern, bytes):
+        return pattern.count(b"\n")
+    return pattern.count("\n")
+
+
+def _join_named_groups(patterns: dict[str, Any]) -> str | bytes:
+    if all(isinstance(pattern, bytes) for pattern in patterns.values()):
+        return b"|".join(
+            b"(?P<%s>%s)" % (group_name.encode(), pattern)
+            for group_name, pattern in patterns.items()
+        )
+    return "|".join(
+        f"(?P<{group_name}>{pattern})" for group_name, pattern in patterns.items()
+    )
+
+
+@functools.lru_cache
+def _get_matcher(rules: tuple[tuple[str, re.Pattern[Any]], ...]) -> RuleMatcher:
+    return RuleMatcher(dict(rules))
+
+
+def get_matcher(rules: RulesDict) -> RuleMatcher:
+    """Return the matcher for the rules, built once per set of rules.
+
+    Args:
+        rules (RulesDict): The rules to find.
+
+    Returns:
+        RuleMatcher: The matcher.
+    """
+    return _get_matcher(tuple(rules.items()))
 
 
 def check_rules_in_file(
-    f: io.BufferedReader, max_lines: int, rules: RulesDict
+    f: io.BufferedReader,
+    max_lines: int,
+    rules: RulesDict,
+    max_bytes: int | None = None,
 ) -> ExitCode:
     """Check the text for rules.
 
+    The lines are searched a few at a time, and reading stops as soon as every rule
+    was found. Lines that are not valid UTF-8 are decoded leniently.
+
     Args:
         f (io.BufferedReader): File pointer to file to check.
         max_lines (int): Maximum lines to search for rule.
         rules (RulesDict): The rules to check form.
+        max_bytes (int | None): Maximum bytes to search for rule. Defaults to None.
 
     Returns:
         ExitCode: The PASS/FAIL state.
     """
     exit_code = ExitCode.OK
-    a = []
-    for idx, line in enumerate(f):
-        if idx > max_lines:
+    matcher = get_matcher(rules)
+    found: set[str] = set()
+    lines: list[str] = []
+    first_unsearched = 0
+    bytes_left = -1 if max_bytes is None else max_bytes
+    while len(found) < len(rules):
+        line = f.readline(bytes_left) if len(lines) <= max_lines and bytes_left else b""
+        if line:
+            lines.append(sanitize_rb_line(line, errors="replace"))
+            bytes_left = max(-1, bytes_left - len(line))
+        if not line or len(lines) - first_unsearched >= _LINES_PER_SEARCH:
+            found |= matcher.find("\n".join(lines[first_unsearched:]))
+            # The next match may start in the last lines searched.
+            first_unsearched = max(0, len(lines) - matcher.max_lines + 1)
+        if not line:
             break
-        a.append(sanitize_rb_line(line))
 
-    search_region = "\n".join(a)
-    for name, rule in rules.items():
-        match = rule.search(search_region)
-        if not match:
+    for name in rules:
+        if name not in found:
             print(f"Failed on check '{name}' for file {f.name}")
             exit_code = ExitCode.FAIL
 
     return exit_code
 
 
+def find_header_end(buffer: Buffer, max_lines: int, max_bytes: int) -> int:
+    """Find where the lines searched for header rules end.
+
+    Args:
+        buffer (Buffer): The file, mapped or read.
+        max_lines (int): Maximum lines to search for rule.
+        max_bytes (int): Maximum bytes to search for rule.
+
+    Returns:
+        int: The offset of the end of the header.
+    """
+    limit = min(len(buffer), max_bytes)
+    pos = 0
+    # As check_rules_in_file, which reads one line past max_lines.
+    for _ in range(max_lines + 1):
+        idx = buffer.find(b"\n", pos, limit)
+        if idx < 0:
+            return limit
+        pos = idx + 1
+    return pos
+
+
+def find_footer_start(buffer: Buffer, max_lines: int, max_bytes: int) -> int:
+    """Find where the lines searched for footer rules start.
+
+    Args:
+        buffer (Buffer): The file, mapped or read.
+        max_lines (int): Maximum lines to search for rule.
+        max_bytes (int): Maximum bytes to search for rule.
+
+    Returns:
+        int: The offset of the start of the footer.
+    """
+    end = len(buffer)
+    limit = max(0, end - max_bytes)
+    # A newline at the end of the file ends the last line, it does not start a new one.
+    pos = end - 1 if buffer[-1:] == b"\n" else end
+    for _ in range(max_lines):
+        pos = buffer.rfind(b"\n", limit, pos)
+        if pos < 0:
+            return limit
+    return pos + 1
+
+
+def is_changed_from(
+    head: Buffer, start: int, last_changed_line: int, max_bytes: int
+) -> bool:
+    """True if a line from an offset on may have changed.
+
+    Only the lines in the first max_bytes are counted, not the whole file: a change
+    past them may be from the offset on.
+
+    Args:
+        head (Buffer): The start of the file, up to the offset or max_bytes at least.
+        start (int): The offset.
+        last_changed_line (int): The last line that changed, counted from 1.
+        max_bytes (int): Maximum bytes to count the lines of.
+
+    Returns:
+        bool: False if the last changed line ends before the offset.
+    """
+    return head[: min(start, max_bytes)].count(b"\n") < last_changed_line
+
+
+def check_rules_in_buffer(
+    buffer: Buffer, start: int, end: int, matcher: RuleMatcher, file_name: str
+) -> ExitCode:
+    """Check a region of a file for rules, without copying it.
+
+    Args:
+        buffer (Buffer): The file, mapped or read.
+        start (int): Where the region starts.
+        end (int): Where the region ends.
+        matcher (RuleMatcher): The matcher of bytes rules.
+        file_name (str): The name of the file, for the report.
+
+    Returns:
+        ExitCode: The PASS/FAIL state.
+    """
+    exit_code = ExitCode.OK
+    for name in matcher.missing(buffer, start, end):
+        print(f"Failed on check '{name}' for file {file_name}")
+        exit_code = ExitCode.FAIL
+    return exit_code
+
+
 class RuleConfig(NamedTuple):
     """Holder for User Input rules."""
 
@@ -67,14 +328,85 @@ class RuleConfig(NamedTuple):
     def rules(self) -> RulesDict:
         """Return the compiled rules."""
         with self.file_path.open() as fp:
-            all_rules: dict[str, str] = json.load(fp)
-        return {
-            rule: re.compile(re.escape("\n".join(all_rules[rule])))
-            for rule in self.enabled_rules
-        }
+            all_rules: dict[str, list[str]] = json.load(fp)
+        return {rule: compile_rule(all_rules[rule]) for rule in self.enabled_rules}
+
+
+def compile_rule(lines: list[str]) -> re.Pattern[str]:
+    """Compile the expected lines of a rule.
+
+    Args:
+        lines (list[str]): The lines, as in the config file.
+
+    Returns:
+        re.Pattern[str]: The rule.
+    """
+    return re.compile(re.escape("\n".join(lines)))
+
+
+class RuleRegistry:
+    """The rules of every config file, shared by all the checks in a process.
+
+    A config file is parsed once, and parsed again only if its mtime, size or inode
+    changed. Config files are known by their absolute path, as relative ones may be
+    relative to other directories, e.g. those of the clients of a server. A rule is
+    compiled the first time it is enabled, so the same rule object is returned for
+    the header and the footer, and for every file.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._configs: dict[
+            pathlib.Path, tuple[tuple[int, int, int] | None, dict[str, list[str]]]
+        ] = {}
+        self._compiled: dict[tuple[pathlib.Path, str], re.Pattern[str]] = {}
+
+    def _load(self, file_path: pathlib.Path) -> dict[str, list[str]]:
+        stamp: tuple[int, int, int] | None
+        try:
+            stat = file_path.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:  # Let opening the file report it, if it really is missing.
+            stamp = None
+        cached = self._configs.get(file_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with file_path.open() as fp:
+            all_rules: dict[str, list[str]] = json.load(fp)
+        self._configs[file_path] = (stamp, all_rules)
+        for key in [key for key in self._compiled if key[0] == file_path]:
+            del self._compiled[key]
+        return all_rules
+
+    def get_rules(self, config: RuleConfig) -> RulesDict:
+        """Return the compiled rules enabled by a config.
+
+        Args:
+            config (RuleConfig): The config.
+
+        Returns:
+            RulesDict: The compiled rules.
+        """
+        file_path = config.file_path.absolute()
+        all_rules = self._load(file_path)
+        rules: RulesDict = {}
+        for rule in config.enabled_rules:
+            key = (file_path, rule)
+            if key not in self._compiled:
+                self._compiled[key] = compile_rule(all_rules[rule])
+            rules[rule] = self._compiled[key]
+        return rules
+
+    def clear(self) -> None:
+        """Forget every config file."""
+        self._configs.clear()
+        self._compiled.clear()
+
+
+RULE_REGISTRY = RuleRegistry()
 
 
-@functools.lru_cache(maxsize=2)
 def get_rules(config: str) -> RulesDict:
     """Return the rules from a given config string.
 
@@ -86,7 +418,7 @@ def get_rules(config: str) -> RulesDict:
     """
     rules: RulesDict = {}
     if config:
-        rules = RuleConfig.parse_arg(config).rules
+        rules = RULE_REGISTRY.get_rules(RuleConfig.parse_arg(config))
     return rules
 
 
@@ -97,11 +429,16 @@ class HeaderFooterArgs(ABCArgs):
     footer_lines: int
     header_config: str
     footer_config: str
+    max_bytes: int
+    diff: ChangedLines | None
 
 
 class HeaderFooterChecker(ABCHook):
     """Checker for Header and Footer."""
 
+    # Only the first and last lines are read, hashing whole files would cost more.
+    cache_by_stat = True
+
     def setup_parser(self) -> None:
         """Custom arguments."""
         self.parser.add_argument(
@@ -130,6 +467,23 @@ class HeaderFooterChecker(ABCHook):
             metavar="<filename>:comma,separated,rules",
             help="The configuration for checking the footer.",
         )
+        self.parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=1024 * 1024,
+            metavar="N",
+            help="How many bytes to search from the top and bottom of the file.",
+        )
+        add_diff_argument(self.parser)
+
+    def cache_fingerprint(self, args: HeaderFooterArgs) -> str:
+        """Include the contents of the config files."""
+        config_contents = []
+        for config in (args.header_config, args.footer_config):
+            if config:
+                file_path = RuleConfig.parse_arg(config).file_path
+                config_contents.append(file_path.read_text(encoding="utf-8"))
+        return json.dumps([super().cache_fingerprint(args), config_contents])
 
     def implementation(
         self,
@@ -137,17 +491,110 @@ class HeaderFooterChecker(ABCHook):
         args: HeaderFooterArgs,
     ) -> ExitCode:
         """Check Implementation."""
-        exit_code = int(ExitCode.OK)
         h_rules = get_rules(args.header_config)
         f_rules = get_rules(args.footer_config)
+        ranges = args.diff.get_ranges(file_name) if args.diff is not None else None
+        if ranges is not None:
+            if not ranges:
+                return ExitCode.OK
+            # As check_rules_in_file, which reads one line past max_lines.
+            if ranges[0].start > args.lines + 1:
+                h_rules = {}
+        data = self.prefetched(file_name)
+        if data is not None:
+            if ranges is not None and f_rules:
+                start = find_footer_start(data, args.footer_lines, args.max_bytes)
+                if not is_changed_from(data, start, ranges[-1].end, args.max_bytes):
+                    f_rules = {}
+            buffer_exit_code = self._implementation_buffer(
+                data, str(file_name), h_rules, f_rules, args
+            )
+            if buffer_exit_code is not None:
+                return buffer_exit_code
+
         with file_name.open("rb") as f:
+            if ranges is not None and f_rules:
+                with span("diff"):
+                    start = find_nth_line_before_end(
+                        f, n=args.footer_lines, max_bytes=args.max_bytes
+                    )
+                    f.seek(0)
+                    head = f.read(min(start, args.max_bytes))
+                    if not is_changed_from(head, start, ranges[-1].end, args.max_bytes):
+                        f_rules = {}
+            mmap_exit_code = self._implementation_mmap(f, h_rules, f_rules, args)
+            if mmap_exit_code is not None:
+                return mmap_exit_code
+
+            exit_code = int(ExitCode.OK)
             if h_rules:
                 n_lines = args.lines
-                exit_code |= check_rules_in_file(f, max_lines=n_lines, rules=h_rules)
+                with span("header"):
+                    exit_code |= check_rules_in_file(
+                        f, max_lines=n_lines, rules=h_rules, max_bytes=args.max_bytes
+                    )
             if f_rules:
                 n_lines = args.footer_lines
-                move_file_pointer_to_nth_line_before_end(f, n=n_lines)
-                exit_code |= check_rules_in_file(f, max_lines=n_lines, rules=f_rules)
+                with span("footer"):
+                    move_file_pointer_to_nth_line_before_end(
+                        f, n=n_lines, max_bytes=args.max_bytes
+                    )
+                    exit_code |= check_rules_in_file(
+                        f, max_lines=n_lines, rules=f_rules, max_bytes=args.max_bytes
+                    )
+        return ExitCode(exit_code)
+
+    @classmethod
+    def _implementation_mmap(
+        cls,
+        f: io.BufferedReader,
+        h_rules: RulesDict,
+        f_rules: RulesDict,
+        args: HeaderFooterArgs,
+    ) -> ExitCode | None:
+        """Check Implementation, matching the mapped file in place.
+
+        Only the pages of the header and footer are read from disk.
+
+        Returns:
+            ExitCode | None: The PASS/FAIL state, None if the file cannot be mapped.
+        """
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # e.g. empty files, pipes
+            return None
+        with buffer:
+            return cls._implementation_buffer(buffer, f.name, h_rules, f_rules, args)
+
+    @staticmethod
+    def _implementation_buffer(
+        buffer: Buffer,
+        file_name: str,
+        h_rules: RulesDict,
+        f_rules: RulesDict,
+        args: HeaderFooterArgs,
+    ) -> ExitCode | None:
+        """Check Implementation, matching the whole file in place.
+
+        Returns:
+            ExitCode | None: The PASS/FAIL state, None if a rule cannot match bytes.
+        """
+        h_matcher = get_matcher(h_rules).bytes_matcher
+        f_matcher = get_matcher(f_rules).bytes_matcher
+        if h_matcher is None or f_matcher is None:
+            return None
+
+        exit_code = int(ExitCode.OK)
+        if h_rules:
+            with span("header"):
+                end = find_header_end(buffer, args.lines, args.max_bytes)
+                exit_code |= check_rules_in_buffer(buffer, 0, end, h_matcher, file_name)
+        if f_rules:
+            with span("footer"):
+                start = find_footer_start(buffer, args.footer_lines, args.max_bytes)
+                exit_code |= check_rules_in_buffer(
+                    buffer, start, len(buffer), f_matcher, file_name
+                )
         return ExitCode(exit_code)
 
 
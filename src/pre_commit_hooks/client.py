@@ -0,0 +1,139 @@
+"""Client that runs the hooks through a server, see :mod:`pre_commit_hooks.server`.
+
+The client is what runs for every batch of files, so it imports as little as it
+can. When no server is listening it runs the hook itself::
+
+    pre-commit-hooks-client check-header-footer --header-config=... FILES
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import socket
+import sys
+from collections.abc import Sequence
+from typing import Any
+
+# The hooks that can be run, by their console script name.
+HOOKS = {
+    "check-header-footer": (
+        "pre_commit_hooks.check_header_footer",
+        "HeaderFooterChecker",
+    ),
+    "arabic-presentation-form": (
+        "pre_commit_hooks.arabic_presentation_form",
+        "ArabicPresentationFormChecker",
+    ),
+}
+
+# The environment variables the hooks read, they are sent to the server.
+ENV_PREFIX = "PRE_COMMIT_HOOKS_"
+
+
+def default_socket_path() -> str:
+    """Return where the server listens, unless told otherwise.
+
+    Returns:
+        str: $PRE_COMMIT_HOOKS_SOCKET, else a socket private to the user.
+    """
+    if socket_path := os.environ.get(f"{ENV_PREFIX}SOCKET"):
+        return socket_path
+    directory = os.environ.get("XDG_RUNTIME_DIR")
+    if not directory:
+        import tempfile
+
+        directory = tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return os.path.join(directory, f"pre-commit-hooks-{user}.sock")
+
+
+def send_request(socket_path: str, request: dict[str, Any]) -> dict[str, Any] | None:
+    """Send a request to the server.
+
+    Only a server run by the same user is trusted, as it reads the files of the
+    request and its output is taken as the result of the hook.
+
+    Args:
+        socket_path (str): Where the server listens.
+        request (dict[str, Any]): The request.
+
+    Returns:
+        dict[str, Any] | None: The response, None if no server is listening, if
+            the socket belongs to another user, or if the server did not reply.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    if hasattr(os, "getuid"):
+        try:
+            owner = os.stat(socket_path).st_uid
+        except OSError:
+            return None
+        if owner != os.getuid():
+            print(
+                f"Ignoring {socket_path}, it belongs to another user.", file=sys.stderr
+            )
+            return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+            with client.makefile("rwb") as stream:
+                stream.write(json.dumps(request).encode("utf-8") + b"\n")
+                stream.flush()
+                line = stream.readline()
+        except OSError:
+            return None
+    if not line:
+        return None
+    response: dict[str, Any] = json.loads(line)
+    return response
+
+
+def run(hook: str, argv: Sequence[str], socket_path: str) -> int:
+    """Run a hook through the server, or in this process if there is none.
+
+    Args:
+        hook (str): The console script name of the hook.
+        argv (Sequence[str]): The arguments of the hook.
+        socket_path (str): Where the server listens.
+
+    Returns:
+        int: The exit code of the hook.
+    """
+    response = send_request(
+        socket_path,
+        {
+            "hook": hook,
+            "argv": list(argv),
+            "cwd": os.getcwd(),
+            "env": {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX)},
+        },
+    )
+    if response is None:
+        return _run_locally(hook, argv)
+
+    sys.stdout.reconfigure(encoding="utf-8")  # type: ignore[union-attr]
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return int(response.get("exit_code", 1))
+
+
+def _run_locally(hook: str, argv: Sequence[str]) -> int:
+    """Run a hook in this process."""
+    module_name, _class_name = HOOKS[hook]
+    exit_code: int = importlib.import_module(module_name).main(argv)
+    return exit_code
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Main entrypoint."""
+    args = sys.argv[1:] if argv is None else list(argv)
+    if not args or args[0] not in HOOKS:
+        print(f"usage: pre-commit-hooks-client {{{','.join(HOOKS)}}} [args ...]")
+        return 2
+    return run(args[0], args[1:], default_socket_path())
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""The lines that changed, for hooks that only check what changed."""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import os
+import re
+from typing import NamedTuple
+
+# "@@ -start[,count] +start[,count] @@"
+_HUNK_REGEX = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# The prefixes are pinned, as diff.mnemonicPrefix or diff.noprefix would change them.
+GIT_DIFF_COMMAND = (
+    "git",
+    "diff",
+    "--cached",
+    "--unified=0",
+    "--no-color",
+    "--no-ext-diff",
+    "--relative",
+    "--src-prefix=a/",
+    "--dst-prefix=b/",
+)
+
+
+class LineRange(NamedTuple):
+    """Lines that changed, from start to end inclusive, counted from 1."""
+
+    start: int
+    end: int
+
+
+class ChangedLines(dict[str, list[LineRange]]):
+    """The lines that changed in every file of a diff.
+
+    A file that is not in the diff did not change. Lines that were only removed
+    count as a change of the line after them, so removing a line is also seen.
+    """
+
+    def get_ranges(self, file_name: str | os.PathLike[str]) -> list[LineRange]:
+        """Return the lines that changed in a file.
+
+        Args:
+            file_name (str | os.PathLike[str]): The file.
+
+        Returns:
+            list[LineRange]: The changed lines, in order. Empty if it did not change.
+        """
+        return self.get(os.path.normpath(file_name), [])
+
+
+def parse_diff(diff: str) -> ChangedLines:
+    """Parse a unified diff, ideally with no context lines.
+
+    Args:
+        diff (str): The diff, e.g. from ``git diff --unified=0``.
+
+    Returns:
+        ChangedLines: The lines that changed, in the new version of the files.
+    """
+    changes = ChangedLines()
+    ranges: list[LineRange] | None = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            ranges = None
+            path = line[4:].split("\t")[0]
+            if path.startswith('"'):  # git quotes paths with special characters
+                import codecs
+
+                # Non-ASCII characters are escaped, unless core.quotePath is false.
+                unquoted: bytes = codecs.escape_decode(path[1:-1].encode("utf-8"))[0]
+                path = unquoted.decode("utf-8")
+            if path != "/dev/null":
+                path = path[2:] if path.startswith("b/") else path
+                ranges = changes.setdefault(os.path.normpath(path), [])
+        elif ranges is not None and (match := _HUNK_REGEX.match(line)):
+            start = int(match.group(1))
+            count = 1 if match.group(2) is None else int(match.group(2))
+            if count == 0:  # Only removed lines, after line `start`.
+                ranges.append(LineRange(start + 1, start + 1))
+            else:
+                ranges.append(LineRange(start, start + count - 1))
+    for ranges in changes.values():
+        ranges.sort()
+    return changes
+
+
+def load_diff(source: str) -> ChangedLines:
+    """Load the lines that changed.
+
+    Args:
+        source (str): "git" for the staged changes, else a file with a unified diff.
+
+    Returns:
+        ChangedLines: The lines that changed.
+    """
+    if source == "git":
+        import subprocess
+
+        try:
+            diff = subprocess.run(
+                GIT_DIFF_COMMAND, capture_output=True, check=True, text=True
+            ).stdout
+        except (OSError, subprocess.CalledProcessError) as exc:
+            raise argparse.ArgumentTypeError(f"could not run git diff: {exc}") from exc
+    else:
+        try:
+            with open(source, encoding="utf-8") as fp:
+                diff = fp.read()
+        except OSError as exc:
+            raise argparse.ArgumentTypeError(f"could not read the diff: {exc}") from exc
+    return parse_diff(diff)
+
+
+def add_diff_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the argument for only checking what changed.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser of the hook.
+    """
+    parser.add_argument(
+        "--diff",
+        type=load_diff,
+        default=None,
+        metavar="git|<diff-file>",
+        help=(
+            "Only check what changed: 'git' for the staged changes, or a file with"
+            " a unified diff. Files that did not change are skipped."
+        ),
+    )
+
+
+def is_line_changed(ranges: list[LineRange], line_no: int) -> bool:
+    """True if the line is in one of the ranges.
+
+    Args:
+        ranges (list[LineRange]): Sorted ranges, as from ChangedLines.
+        line_no (int): The line, counted from 1.
+
+    Returns:
+        bool: If the line changed.
+    """
+    idx = bisect.bisect_right(ranges, (line_no, float("inf"))) - 1
+    return idx >= 0 and ranges[idx].end >= line_no
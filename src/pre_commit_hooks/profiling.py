@@ -0,0 +1,175 @@
+"""Timing of the files a hook checks, and of the phases of checking them."""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import os
+import pathlib
+import time
+from collections.abc import Callable, Iterator
+from typing import Any, NamedTuple, TypeVar
+
+_T = TypeVar("_T")
+
+
+class Span(NamedTuple):
+    """A phase of checking a file, e.g. reading it."""
+
+    name: str
+    start: float
+    duration: float
+
+
+class FileTiming(NamedTuple):
+    """How long a file took to check."""
+
+    file_name: str
+    start: float
+    duration: float
+    n_bytes: int
+    spans: list[Span]
+    pid: int
+
+
+_current_spans: contextvars.ContextVar[list[Span] | None] = contextvars.ContextVar(
+    "_current_spans", default=None
+)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a phase of checking a file, if the file is being timed.
+
+    Args:
+        name (str): The name of the phase, e.g. "read", "match", "write".
+
+    Yields:
+        None: While in the phase.
+    """
+    spans = _current_spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append(Span(name, start, time.perf_counter() - start))
+
+
+def time_file(file_name: str, check: Callable[[], _T]) -> tuple[_T, FileTiming]:
+    """Time checking a file, and the phases reported with :func:`span`.
+
+    Args:
+        file_name (str): The file.
+        check (Callable[[], _T]): Checks the file.
+
+    Returns:
+        tuple[_T, FileTiming]: (What check returned, The timing).
+    """
+    try:
+        n_bytes = os.stat(file_name).st_size
+    except OSError:
+        n_bytes = 0
+    spans: list[Span] = []
+    token = _current_spans.set(spans)
+    start = time.perf_counter()
+    try:
+        result = check()
+    finally:
+        duration = time.perf_counter() - start
+        _current_spans.reset(token)
+    return result, FileTiming(file_name, start, duration, n_bytes, spans, os.getpid())
+
+
+class Timings:
+    """The timings of every file of a run."""
+
+    def __init__(self) -> None:
+        """Start the run."""
+        self.start = time.perf_counter()
+        self.files: list[FileTiming] = []
+
+    def add(self, timing: FileTiming) -> None:
+        """Add the timing of a file."""
+        self.files.append(timing)
+
+    def report(self, top_n: int) -> str:
+        """Return the slowest files, with the time of their phases.
+
+        Args:
+            top_n (int): How many files to report.
+
+        Returns:
+            str: The report.
+        """
+        total_s = sum(t.duration for t in self.files)
+        total_mb = sum(t.n_bytes for t in self.files) / (1 << 20)
+        slowest = sorted(self.files, key=lambda t: t.duration, reverse=True)[:top_n]
+        lines = [
+            f"Slowest {len(slowest)} of {len(self.files)} files"
+            f" ({total_s:.3f}s, {total_mb:.2f} MB in total):"
+        ]
+        for timing in slowest:
+            phases: dict[str, float] = {}
+            for phase in timing.spans:
+                phases[phase.name] = phases.get(phase.name, 0) + phase.duration
+            detail = ", ".join(f"{name} {s:.3f}s" for name, s in phases.items())
+            lines.append(
+                f"  {timing.duration:8.3f}s {timing.n_bytes / (1 << 20):9.2f} MB"
+                f"  {timing.file_name}" + (f"  [{detail}]" if detail else "")
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """Return the timings in the Chrome trace event format.
+
+        The trace can be opened with chrome://tracing or https://ui.perfetto.dev.
+
+        Returns:
+            dict[str, Any]: The trace, as JSON.
+        """
+        events = []
+        for timing in self.files:
+            events.append(
+                self._event(
+                    timing.file_name,
+                    timing.start,
+                    timing.duration,
+                    timing.pid,
+                    {"bytes": timing.n_bytes},
+                )
+            )
+            events.extend(
+                self._event(s.name, s.start, s.duration, timing.pid)
+                for s in timing.spans
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def _event(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        pid: int,
+        args: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        return {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.start) * 1e6,
+            "dur": duration * 1e6,
+            "pid": pid,
+            "tid": pid,
+            "args": args or {},
+        }
+
+    def save(self, file_path: pathlib.Path) -> None:
+        """Write the timings as a Chrome trace.
+
+        Args:
+            file_path (pathlib.Path): The file to write.
+        """
+        file_path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
@@ -0,0 +1,171 @@
+"""Server that keeps the hooks loaded, to run them for clients.
+
+Starting a hook costs more than checking a handful of files: the imports and the
+rules. The server pays for that once, and then runs the hooks for clients that
+connect to it over a Unix socket, see :mod:`pre_commit_hooks.client`::
+
+    pre-commit-hooks-server serve &
+    pre-commit-hooks-client check-header-footer --header-config=... FILES
+
+A request is a JSON line ``{"hook", "argv", "cwd", "env"}``, and the response a JSON
+line ``{"exit_code", "stdout", "stderr"}``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import pathlib
+import socket
+import sys
+import traceback
+import typing
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+from .client import ENV_PREFIX, HOOKS, default_socket_path, send_request
+
+if typing.TYPE_CHECKING:
+    from .util import ABCHook
+
+
+def get_hook(name: str) -> ABCHook:
+    """Return a new instance of a hook.
+
+    Args:
+        name (str): The console script name of the hook.
+
+    Returns:
+        ABCHook: The hook.
+    """
+    module_name, class_name = HOOKS[name]
+    hook: ABCHook = getattr(importlib.import_module(module_name), class_name)()
+    return hook
+
+
+@contextlib.contextmanager
+def _client_context(cwd: str, env: dict[str, str]) -> Iterator[None]:
+    """Run in the directory, and with the hook environment, of the client."""
+    old_cwd = os.getcwd()
+    old_env = {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX)}
+    os.chdir(cwd)
+    for key in old_env:
+        del os.environ[key]
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.chdir(old_cwd)
+        for key in [k for k in os.environ if k.startswith(ENV_PREFIX)]:
+            del os.environ[key]
+        os.environ.update(old_env)
+
+
+def handle_request(request: dict[str, Any]) -> dict[str, Any]:
+    """Run a hook for a client.
+
+    Args:
+        request (dict[str, Any]): The request.
+
+    Returns:
+        dict[str, Any]: The response.
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with (
+        _client_context(request["cwd"], request["env"]),
+        contextlib.redirect_stdout(stdout),
+        contextlib.redirect_stderr(stderr),
+    ):
+        try:
+            exit_code = int(get_hook(request["hook"]).run(request["argv"]))
+        except SystemExit as exc:  # e.g. argparse errors, and --help
+            if isinstance(exc.code, int) or exc.code is None:
+                exit_code = exc.code or 0
+            else:
+                print(exc.code, file=sys.stderr)
+                exit_code = 1
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+    return {
+        "exit_code": exit_code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+def serve(socket_path: str, idle_timeout: float | None) -> None:
+    """Run hooks for clients, one at a time, until stopped or idle.
+
+    Args:
+        socket_path (str): Where to listen.
+        idle_timeout (float | None): Stop after this many seconds without a request.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        old_umask = os.umask(0o077)  # Only the user may connect.
+        try:
+            server.bind(socket_path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+        server.settimeout(idle_timeout)
+        try:
+            while True:
+                try:
+                    connection, _address = server.accept()
+                except TimeoutError:
+                    return
+                try:
+                    with connection, connection.makefile("rwb") as stream:
+                        line = stream.readline()
+                        if not line:  # e.g. a client checking that we are up.
+                            continue
+                        request = json.loads(line)
+                        if request.get("command") == "stop":
+                            return
+                        response = handle_request(request)
+                        stream.write(json.dumps(response).encode("utf-8") + b"\n")
+                except Exception:  # e.g. a bad request, or a client that went away.
+                    traceback.print_exc()
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(socket_path)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--socket",
+        default=default_socket_path(),
+        metavar="<path>",
+        help="Where the server listens. Defaults to $PRE_COMMIT_HOOKS_SOCKET, if set.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Run the server.")
+    serve_parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=900,
+        metavar="SECONDS",
+        help="Stop after this long without a request. 0 = never.",
+    )
+    commands.add_parser("stop", help="Stop the server.")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        pathlib.Path(args.socket).parent.mkdir(parents=True, exist_ok=True)
+        serve(args.socket, idle_timeout=args.idle_timeout or None)
+    else:
+        send_request(args.socket, {"command": "stop"})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
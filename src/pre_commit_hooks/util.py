@@ -4,15 +4,22 @@ from __future__ import annotations
 
 import abc
 import argparse
+import collections
+import contextlib
 import enum
+import functools
 import io
+import itertools
 import json
 import os
 import pathlib
+import sys
 import typing
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
 from typing import Any
 
+from . import profiling
+
 
 class ExitCode(enum.IntEnum):
     """Exit Codes returned by the application."""
@@ -25,23 +32,157 @@ class ABCArgs(abc.ABC, argparse.Namespace):
     """ABC for Namespaces."""
 
     filenames: Sequence[str]
+    jobs: int
+    cache_dir: str | None
+    cache_size: int
+    cache_by_stat: bool | None
+    timings: bool
+    timings_top: int
+    timings_file: str | None
+    profile: str | None
+    prefetch: int
+
+
+# Files larger than this are not read ahead, the hooks read them as they need them.
+PREFETCH_MAX_BYTES = 1024 * 1024
+
+# Arguments that change how a hook runs, but not its result for a file.
+_RUN_ARGS = frozenset(
+    {
+        "filenames",
+        "jobs",
+        "cache_dir",
+        "cache_size",
+        "cache_by_stat",
+        "timings",
+        "timings_top",
+        "timings_file",
+        "profile",
+        "prefetch",
+    }
+)
 
 
 class ABCHook(abc.ABC):
     """Hook base."""
 
+    cache_by_stat = False
+    """Key the result cache by file size, mtime and inode unless --no-cache-by-stat.
+
+    For hooks that only read part of a file, hashing all of it costs more than
+    checking it again.
+    """
+
     def __init__(self) -> None:
         """Initialize the hook with required defaults."""
         parser = argparse.ArgumentParser()
         parser.add_argument("filenames", nargs="*")
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            metavar="N",
+            help="How many worker processes to check files with. 0 = CPU count.",
+        )
+        parser.add_argument(
+            "--cache-dir",
+            type=str,
+            default=os.environ.get("PRE_COMMIT_HOOKS_CACHE_DIR"),
+            metavar="<directory>",
+            help=(
+                "Remember the files that passed in this directory, and skip them"
+                " while they and the arguments are unchanged."
+                " Defaults to $PRE_COMMIT_HOOKS_CACHE_DIR, if set."
+            ),
+        )
+        parser.add_argument(
+            "--cache-size",
+            type=non_negative_int,
+            default=100_000,
+            metavar="N",
+            help="How many files to remember at most. 0 = none.",
+        )
+        parser.add_argument(
+            "--cache-by-stat",
+            action=argparse.BooleanOptionalAction,
+            default=None,
+            help=(
+                "Identify files by size, mtime and inode instead of their content."
+                " Defaults to on for hooks that only read part of a file."
+            ),
+        )
+        parser.add_argument(
+            "--prefetch",
+            type=int,
+            default=0,
+            metavar="N",
+            help=(
+                "Read the next files in N background threads while checking a file."
+                " Helps with many small files on slow filesystems. 0 = off."
+            ),
+        )
+        parser.add_argument(
+            "--timings",
+            action="store_true",
+            default=bool(os.environ.get("PRE_COMMIT_HOOKS_TIMINGS")),
+            help=(
+                "Report the slowest files, and the phases they spent their time in."
+                " Defaults to on if $PRE_COMMIT_HOOKS_TIMINGS is set."
+            ),
+        )
+        parser.add_argument(
+            "--timings-top",
+            type=int,
+            default=10,
+            metavar="N",
+            help="How many of the slowest files to report.",
+        )
+        parser.add_argument(
+            "--timings-file",
+            type=str,
+            default=None,
+            metavar="<filename>",
+            help="Write the timings of every file, as a Chrome trace (JSON).",
+        )
+        parser.add_argument(
+            "--profile",
+            type=str,
+            default=None,
+            metavar="<filename>",
+            help=(
+                "Write a cProfile dump of the run, see pstats."
+                " Only this process is profiled, use with --jobs 1."
+            ),
+        )
         self._parser = parser
+        self._prefetched: tuple[str, bytes | None] = ("", None)
         self.setup_parser()
 
+    def __reduce__(self) -> tuple[type[ABCHook], tuple[()]]:
+        """Pickle by re-creating the hook, the parser itself is not picklable."""
+        return (type(self), ())
+
     @property
     def parser(self) -> argparse.ArgumentParser:
         """Return the parser."""
         return self._parser
 
+    def prefetched(self, file_name: pathlib.Path) -> bytes | None:
+        """Return the contents of a file, if they were read ahead with --prefetch.
+
+        Implementations use this instead of opening the file themselves, and open
+        it when this is None, e.g. for files too large to read ahead.
+
+        Args:
+            file_name (pathlib.Path): The file being checked.
+
+        Returns:
+            bytes | None: The contents of the file, None if not read ahead.
+        """
+        prefetched_name, data = self._prefetched
+        return data if prefetched_name == str(file_name) else None
+
     @abc.abstractmethod
     def setup_parser(self) -> None:
         """The custom implementation of any additional arguments."""
@@ -58,47 +199,371 @@ class ABCHook(abc.ABC):
             ExitCode: The PASS/FAIL state.
         """
 
+    def cache_fingerprint(self, args: Any) -> str:
+        """Identify everything, other than the file, that the result depends on.
+
+        Override to add any configuration that is not in the arguments themselves,
+        e.g. the contents of a config file the arguments point to.
+
+        Args:
+            args (ABCArgs): The arguments from self.parser.parse_args()
+
+        Returns:
+            str: The fingerprint.
+        """
+        from .__about__ import __version__
+
+        hook_args = {k: v for k, v in vars(args).items() if k not in _RUN_ARGS}
+        return json.dumps(
+            [type(self).__module__, type(self).__qualname__, __version__, hook_args],
+            sort_keys=True,
+            default=str,
+        )
+
     def run(self, argv: Sequence[str] | None) -> ExitCode:
         """Run the custom implementation, feeding it all files."""
         args: ABCArgs = self.parser.parse_args(argv)  # type: ignore[assignment]
-        return_value = int(ExitCode.OK)
-        for filename in args.filenames:
-            return_value |= int(
-                self.implementation(file_name=pathlib.Path(filename), args=args)
+        if not args.profile:
+            return self._run(args)
+
+        import cProfile
+
+        with cProfile.Profile() as profiler:
+            try:
+                return self._run(args)
+            finally:
+                profiler.dump_stats(args.profile)
+
+    def _run(self, args: ABCArgs) -> ExitCode:
+        filenames = list(args.filenames)
+        cache = None
+        if args.cache_dir:
+            from .cache import ResultCache
+
+            cache = ResultCache(
+                pathlib.Path(args.cache_dir) / f"{type(self).__name__}.json",
+                fingerprint=self.cache_fingerprint(args),
+                max_entries=args.cache_size,
+                by_stat=(
+                    self.cache_by_stat
+                    if args.cache_by_stat is None
+                    else args.cache_by_stat
+                ),
             )
+            cache_keys = {f: cache.key(pathlib.Path(f)) for f in filenames}
+            filenames = [f for f in filenames if not cache.is_ok(cache_keys[f])]
+
+        timings = None
+        if args.timings or args.timings_file:
+            timings = profiling.Timings()
+
+        return_value = int(ExitCode.OK)
+        for filename, exit_code, timing in self._iter_results(
+            args, filenames, timed=timings is not None
+        ):
+            return_value |= exit_code
+            if cache and exit_code == ExitCode.OK:
+                cache.add(cache_keys[filename])
+            if timings and timing:
+                timings.add(timing)
+
+        if cache:
+            cache.save()
+        if timings:
+            if args.timings:
+                print(timings.report(args.timings_top), file=sys.stderr)
+            if args.timings_file:
+                timings.save(pathlib.Path(args.timings_file))
         return ExitCode(return_value)
 
+    def _iter_results(
+        self, args: ABCArgs, filenames: list[str], timed: bool = False
+    ) -> Iterator[tuple[str, int, profiling.FileTiming | None]]:
+        """Run the custom implementation on the files, in order.
+
+        Yields:
+            tuple[str, int, FileTiming | None]: (The file, The PASS/FAIL state,
+                How long it took, if timed).
+        """
+        jobs = min(args.jobs or os.cpu_count() or 1, len(filenames))
+        if jobs <= 1 and args.prefetch > 0 and len(filenames) > 1:
+            for filename, data in _iter_prefetched(filenames, args.prefetch):
+                self._prefetched = (str(pathlib.Path(filename)), data)
+                try:
+                    yield (filename, *_run_implementation(self, args, filename, timed))
+                finally:
+                    self._prefetched = ("", None)
+            return
+        if jobs <= 1:
+            for filename in filenames:
+                yield (filename, *_run_implementation(self, args, filename, timed))
+            return
+
+        # Fan the files out over a process pool. The output of each file is captured
+        # in the worker and printed here, so diagnostics stay grouped per file.
+        # A few chunks per worker: amortizes the IPC without starving the pool.
+        chunksize = max(1, len(filenames) // (jobs * 4))
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            for filename, (exit_code, timing, output) in zip(
+                filenames,
+                executor.map(
+                    functools.partial(_run_implementation_captured, self, args, timed),
+                    filenames,
+                    chunksize=chunksize,
+                ),
+            ):
+                sys.stdout.write(output)
+                yield filename, exit_code, timing
+
+
+def non_negative_int(value: str) -> int:
+    """Parse a count that may be 0, for argparse.
+
+    Args:
+        value (str): The argument.
+
+    Returns:
+        int: The count.
+    """
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {count}")
+    return count
+
+
+def _read_small_file(filename: str) -> bytes | None:
+    """Read a file, unless it is too large to read ahead or cannot be read."""
+    try:
+        with open(filename, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size > PREFETCH_MAX_BYTES:
+                return None
+            return fp.read()
+    except OSError:  # Left for the hook to report, when it opens the file.
+        return None
+
+
+def _iter_prefetched(
+    filenames: list[str], n_threads: int
+) -> Iterator[tuple[str, bytes | None]]:
+    """Read files ahead in background threads, keeping a few in flight.
+
+    Args:
+        filenames (list[str]): The files, in order.
+        n_threads (int): How many files to read at once.
+
+    Yields:
+        tuple[str, bytes | None]: (The file, Its contents, None if not read ahead).
+    """
+    import concurrent.futures
+
+    window = 2 * n_threads
+    seen: set[str] = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+        pending: collections.deque[
+            tuple[str, concurrent.futures.Future[bytes | None] | None]
+        ] = collections.deque()
+
+        def submit(filename: str) -> None:
+            # A file given twice is read again, a hook may have changed it.
+            if filename in seen:
+                pending.append((filename, None))
+            else:
+                seen.add(filename)
+                pending.append((filename, executor.submit(_read_small_file, filename)))
+
+        remaining = iter(filenames)
+        for filename in itertools.islice(remaining, window):
+            submit(filename)
+        while pending:
+            filename, future = pending.popleft()
+            if (next_filename := next(remaining, None)) is not None:
+                submit(next_filename)
+            yield filename, None if future is None else future.result()
+
+
+def _run_implementation(
+    hook: ABCHook, args: ABCArgs, filename: str, timed: bool
+) -> tuple[int, profiling.FileTiming | None]:
+    """Run the hook implementation for one file.
+
+    Args:
+        hook (ABCHook): The hook to run.
+        args (ABCArgs): The arguments from hook.parser.parse_args()
+        filename (str): The file to be processed.
+        timed (bool): Time the file.
+
+    Returns:
+        tuple[int, FileTiming | None]: (The PASS/FAIL state, How long it took).
+    """
+    file_name = pathlib.Path(filename)
+    if not timed:
+        return int(hook.implementation(file_name=file_name, args=args)), None
+    exit_code, timing = profiling.time_file(
+        filename, lambda: hook.implementation(file_name=file_name, args=args)
+    )
+    return int(exit_code), timing
+
+
+def _run_implementation_captured(
+    hook: ABCHook, args: ABCArgs, timed: bool, filename: str
+) -> tuple[int, profiling.FileTiming | None, str]:
+    """Run the hook implementation for one file, capturing what it prints.
+
+    Args:
+        hook (ABCHook): The hook to run.
+        args (ABCArgs): The arguments from hook.parser.parse_args()
+        timed (bool): Time the file.
+        filename (str): The file to be processed.
+
+    Returns:
+        tuple[int, FileTiming | None, str]: (The PASS/FAIL state,
+            How long it took, The captured output).
+    """
+    with io.StringIO() as buffer, contextlib.redirect_stdout(buffer):
+        exit_code, timing = _run_implementation(hook, args, filename, timed)
+        return exit_code, timing, buffer.getvalue()
+
+
+def find_nth_line_before_end(
+    file_pointer: io.BufferedReader,
+    n: int = 1,
+    block_size: int = 8192,
+    max_bytes: int | None = None,
+) -> int:
+    """Find where the nth before last line of a file starts.
+
+    The file is read backwards in blocks, counting the newlines in each block.
+    A newline at the end of the file ends the last line, it does not start a new
+    one. Lines ending in CRLF are counted by their LF.
+
+    Args:
+        file_pointer (io.BufferedReader): File pointer opened in 'rb' mode.
+        n (int): Lines before the last. 1 = The last line. Defaults to 1.
+        block_size (int): How many bytes to read at once. Defaults to 8192.
+        max_bytes (int | None): Look at most this many bytes back, the offset may
+            then be in the middle of a line. Defaults to None.
+
+    Returns:
+        int: The offset of the start of the line, 0 if the file has fewer lines.
+    """
+    end = file_pointer.seek(0, os.SEEK_END)
+    if n < 1 or end == 0:
+        return end
+    limit = 0 if max_bytes is None else max(0, end - max_bytes)
+    file_pointer.seek(end - 1)
+    pos = end - 1 if file_pointer.read(1) == b"\n" else end
+
+    num_newlines = 0
+    while pos > limit:
+        block_start = max(limit, pos - block_size)
+        file_pointer.seek(block_start)
+        block = file_pointer.read(pos - block_start)
+        block_newlines = block.count(b"\n")
+        if num_newlines + block_newlines >= n:
+            idx = len(block)
+            for _ in range(n - num_newlines):
+                idx = block.rfind(b"\n", 0, idx)
+            return block_start + idx + 1
+        num_newlines += block_newlines
+        pos = block_start
+    return limit
+
 
 def move_file_pointer_to_nth_line_before_end(
-    file_pointer: io.BufferedReader, n: int = 1
+    file_pointer: io.BufferedReader, n: int = 1, max_bytes: int | None = None
 ) -> None:
     """Move the file pointer to the nth before last line of a file.
 
     Args:
         file_pointer (io.BufferedReader): File pointer opened in 'rb' mode.
-        n (int): Lines before the last. 1 = End of the file. Defaults to 1.
+        n (int): Lines before the last. 1 = The last line. Defaults to 1.
+        max_bytes (int | None): Move at most this many bytes back. Defaults to None.
     """
-    num_newlines = 0
-    try:
-        file_pointer.seek(-2, os.SEEK_END)
-        while num_newlines < n:
-            file_pointer.seek(-2, os.SEEK_CUR)
-            if file_pointer.read(1) == b"\n":
-                num_newlines += 1
-    except OSError:
-        file_pointer.seek(0)
+    file_pointer.seek(find_nth_line_before_end(file_pointer, n=n, max_bytes=max_bytes))
+
+
+def read_last_lines(file_pointer: io.BufferedReader, n: int = 1) -> list[bytes]:
+    """Read the last lines of a file.
+
+    Args:
+        file_pointer (io.BufferedReader): File pointer opened in 'rb' mode.
+        n (int): How many lines to read. Defaults to 1.
+
+    Returns:
+        list[bytes]: The lines, with their line endings.
+    """
+    move_file_pointer_to_nth_line_before_end(file_pointer, n=n)
+    return file_pointer.readlines()
+
+
+class AtomicReplacement:
+    """A temporary file next to a file, that can replace it in one step.
+
+    Used as a context manager, the temporary file is removed on exit unless it
+    replaced the original file.
+    """
+
+    def __init__(self, file_path: pathlib.Path) -> None:
+        """Create the temporary file in the same directory as the file to replace.
+
+        Args:
+            file_path (pathlib.Path): The file to replace.
+        """
+        import tempfile
+
+        self.file_path = file_path
+        fd, tmp_name = tempfile.mkstemp(
+            dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+        )
+        os.close(fd)
+        self.tmp_path = pathlib.Path(tmp_name)
+
+    def __enter__(self) -> AtomicReplacement:
+        """Enter."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Remove the temporary file, if it was not used."""
+        self.tmp_path.unlink(missing_ok=True)
+
+    def replace(self) -> None:
+        """Move the temporary file over the original file, keeping its mode."""
+        import shutil
+
+        with contextlib.suppress(FileNotFoundError):
+            shutil.copymode(self.file_path, self.tmp_path)
+        os.replace(self.tmp_path, self.file_path)
+
+
+def write_file_atomic(file_path: pathlib.Path, data: bytes) -> None:
+    """Replace the contents of a file, without ever leaving it partially written.
+
+    Args:
+        file_path (pathlib.Path): The file to replace.
+        data (bytes): The new contents of the file.
+    """
+    with AtomicReplacement(file_path) as replacement:
+        replacement.tmp_path.write_bytes(data)
+        replacement.replace()
 
 
-def sanitize_rb_line(line: bytes) -> str:
+def sanitize_rb_line(line: bytes, errors: str = "strict") -> str:
     """Sanitize a line read in binary mode. Removing line endings.
 
     Args:
         line (bytes): The data in bytes
+        errors (str): How to handle data that is not UTF-8, see bytes.decode.
+            Defaults to "strict".
 
     Returns:
         str: The sanitized line.
     """
-    return line.decode().rstrip()
+    return line.decode(errors=errors).rstrip()
 
 
 def load_json_source(file_or_json_str: str) -> dict[str, Any]:
@@ -4,11 +4,15 @@ from __future__ import annotations
 
 import json
 import pathlib
+import sys
 import tempfile
+import unicodedata
+from unittest import mock
 
 import pytest
 
 from pre_commit_hooks import arabic_presentation_form as _hook
+from pre_commit_hooks.diff import ChangedLines, LineRange
 from pre_commit_hooks.util import ExitCode, load_json_source
 
 PATCH_BASE = f"{_hook.__name__}"
@@ -22,6 +26,12 @@ def generic_test(
     test_file: pathlib.Path,
     custom_rules: _hook.char_map.CHAR_MAP_TYPE = CUSTOM_RULES,
     excluded_chars="",
+    chunk_size=1024 * 1024,
+    summary=False,
+    max_reports=None,
+    cache_dir=None,
+    diff=None,
+    backend="python",
 ) -> ExitCode:
     """Helper function to coordinate the running of the test.
 
@@ -35,6 +45,12 @@ def generic_test(
         filenames=[test_file],
         custom_rules=load_json_source(json.dumps(custom_rules)),
         excluded_chars=excluded_chars,
+        chunk_size=chunk_size,
+        summary=summary,
+        max_reports=max_reports,
+        cache_dir=cache_dir,
+        backend=backend,
+        diff=diff,
     )
     argparser = _hook.ArabicPresentationFormChecker()
     return_code = argparser.implementation(test_file, parsed_args)
@@ -48,8 +64,15 @@ def generic_test(
         ("ﻃَﺎﻟَﻤَﺎ", "ﻃَالَمَا", {"ṭāʾ": {"rule": {"\u0637": "(NOPE)"}}}, "", ExitCode.FAIL),
         ("بَابَ", "بَابَ", {}, "", ExitCode.OK),
         ("ﷺ", "ﷺ", {}, "(ﷺ)", ExitCode.OK),
+        ("ﭒ ﷲ", "ٻ ﷲ", {}, "", ExitCode.FAIL),
+    ],
+    ids=[
+        "fix",
+        "unfixable (rule override)",
+        "no fix required",
+        "excluded char",
+        "generated",
     ],
-    ids=["fix", "unfixable (rule override)", "no fix required", "excluded char"],
 )
 def test_fixer(
     raw_arabic: str,
@@ -70,9 +93,463 @@ def test_fixer(
                 custom_rules=custom_rules,
                 excluded_chars=excluded_chars,
             )
-            # file.close()
-            assert parsed_arabic in file.read()
+            # The fixed file replaces the original, so read it again by name
+            assert parsed_arabic in pathlib.Path(file.name).read_text(encoding="utf-8")
         finally:
             file.__del__()
     # THEN: We get the expected exit code
     assert return_code == expected
+
+
+@pytest.mark.skipif(
+    unicodedata.unidata_version != _hook.presentation_forms.UNIDATA_VERSION,
+    reason="generated with another version of Unicode",
+)
+def test_presentation_forms_up_to_date():
+    # GIVEN: the generated module of presentation forms
+    from pre_commit_hooks.arabic_presentation_form import generate
+
+    # WHEN: we generate it again
+    source = generate.format_module(generate.generate_presentation_forms())
+    # THEN: it is the same
+    assert source == generate.MODULE_FILE.read_text(encoding="utf-8")
+    #  and it covers both presentation form blocks
+    assert {cp >> 8 for cp in _hook.presentation_forms.PRESENTATION_FORMS} == set(
+        range(0xFB, 0xFF)
+    )
+
+
+def test_engine_cache():
+    custom_rules = {"ṭāʾ": {"rule": {"ط": "(NOPE)"}}}
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: the engine was built, and kept in a cache directory
+        _hook.engine._get_engine.cache_clear()
+        built = _hook.get_engine(custom_rules, cache_dir=tmp_folder)
+        assert len(list(pathlib.Path(tmp_folder).glob("engine-*.json"))) == 1
+        # WHEN: a later run gets the engine
+        _hook.engine._get_engine.cache_clear()
+        with mock.patch.object(
+            _hook.engine.NormalizationEngine,
+            "__init__",
+            side_effect=AssertionError("engine built again"),
+        ):
+            loaded = _hook.get_engine(custom_rules, cache_dir=tmp_folder)
+        # THEN: it is loaded, and normalizes as the one that was built
+        line = "aﻃbﻼ ﺎ"  # noqa: RUF001
+        assert loaded.normalize(line) == built.normalize(line)
+        #  and other rules do not use it
+        assert _hook.engine.rules_fingerprint({}) != (
+            _hook.engine.rules_fingerprint(custom_rules)
+        )
+        #  nor does another version of the engine
+        fingerprint = _hook.engine.rules_fingerprint(custom_rules)
+        with mock.patch.object(_hook.engine, "ENGINE_FORMAT_VERSION", -1):
+            assert _hook.engine.rules_fingerprint(custom_rules) != fingerprint
+    _hook.engine._get_engine.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "saved",
+    [
+        "[not json",
+        "[]",
+        '{"table": {}}',
+        '{"table": {}, "rule_names": {}, "sequences": {"ab": 5}}',
+    ],
+    ids=["not json", "not an object", "missing keys", "bad sequence"],
+)
+def test_engine_cache_corrupt(saved: str):
+    custom_rules = {"ṭāʾ": {"rule": {"ط": "(NOPE)"}}}
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a kept engine that is not valid
+        cache_file = (
+            pathlib.Path(tmp_folder)
+            / f"engine-{_hook.engine.rules_fingerprint(custom_rules)}.json"
+        )
+        cache_file.write_text(saved, encoding="utf-8")
+        # WHEN: a run gets the engine
+        _hook.engine._get_engine.cache_clear()
+        loaded = _hook.get_engine(custom_rules, cache_dir=tmp_folder)
+        # THEN: it is built again, and replaces the one kept
+        assert loaded.normalize("ﻃﺎ") == _hook.NormalizationEngine(
+            custom_rules
+        ).normalize("ﻃﺎ")
+        assert '"sequences"' in cache_file.read_text(encoding="utf-8")
+    _hook.engine._get_engine.cache_clear()
+
+
+def test_engine_sequences():
+    # GIVEN: rules of sequences, some of which start with others
+    custom_rules = {
+        "lam alif": {"rule": {"لا": "(ﻟﺎ|ﻠﺎ)"}},
+        "lam lam": {"rule": {"لل": "ﻟ{2}"}},
+        "lam lam alif": {"rule": {"للا": "ﻟﻟﺎ"}},
+    }
+    #  and hundreds of other ligatures
+    for idx in range(500):
+        custom_rules[f"ligature {idx}"] = {
+            "rule": {"x": f"ﻃ{chr(0x0660 + idx % 10)}{idx}"}
+        }
+    engine = _hook.get_engine(custom_rules)
+    # WHEN: we normalize a line with them
+    ligature = f"ﻃ{chr(0x0662)}342"
+    new_line, fixes = engine.normalize(f"aﻟﻟﺎ ﻟﻟ ﻠﺎﻃ {ligature}")  # noqa: RUF001
+    # THEN: the longest sequence is replaced, and reported at its column
+    assert new_line == "aللا لل لاط x"  # noqa: RUF001
+    assert [(fix.col_no, fix.original, fix.rule_name) for fix in fixes] == [
+        (2, "ﻟﻟﺎ", "lam lam alif"),
+        (6, "ﻟﻟ", "lam lam"),
+        (9, "ﻠﺎ", "lam alif"),
+        (11, "ﻃ", "ṭāʾ"),
+        (13, ligature, "ligature 342"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("excluded_chars", "is_table_only"),
+    [
+        ("[ﻃﷺ]", True),
+        ("ﻃ|ﷺ+", False),
+        ("(?i)ﻃ|ﷺ+", False),
+        ("(?P<sequence>ﻃ)|(?P<character>ﷺ)+", False),
+    ],
+    ids=["character set", "regex", "inline flags", "group names"],
+)
+def test_engine_excluding(excluded_chars: str, is_table_only: bool):
+    # GIVEN: an engine that excludes some characters
+    engine = _hook.get_engine({}).excluding(excluded_chars)
+    # WHEN: we normalize lines with and without anything else to fix
+    new_line, fixes = engine.normalize("ﻃﺎ ﷺﷺ")
+    # THEN: the excluded characters are neither fixed nor reported
+    assert new_line == "ﻃا ﷺﷺ"
+    assert [(fix.col_no, fix.original) for fix in fixes] == [(2, "ﺎ")]  # noqa: RUF001
+    #  and a line with only excluded characters is left as it is
+    assert engine.normalize("ﻃ ﷺ") == ("ﻃ ﷺ", [])
+    #  and the exclusion is compiled once, into the table when it is a set
+    assert engine.is_table_only is is_table_only
+    assert _hook.get_engine({}).excluding(excluded_chars) is engine
+    assert _hook.get_engine({}).excluding("") is _hook.get_engine({})
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    ["\\u0649", "[\\u0649a-c]", "\\u0649+", "[^\\s]"],
+    ids=["escaped", "range", "unbounded", "negated class"],
+)
+def test_engine_custom_rule_patterns(pattern: str):
+    # GIVEN: a custom rule whose regex does not name its characters literally
+    engine = _hook.get_engine({"ya": {"rule": {chr(0x064A): pattern}}})
+    # WHEN: we normalize a line with a character it matches
+    new_line, fixes = engine.normalize(f"ﻃ {chr(0x0649)}")
+    # THEN: the rule is applied, after the inbuilt rules
+    assert new_line == f"{chr(0x0637)} {chr(0x064A)}"
+    assert [(fix.col_no, fix.rule_name) for fix in fixes] == [(1, "ṭāʾ"), (3, "ya")]
+
+
+def test_engine_reports_columns():
+    # GIVEN: a line with a fixable, an unfixable and a multi-character replacement
+    engine = _hook.get_engine({"ṭāʾ": {"rule": {"ط": "(NOPE)"}}})
+    # WHEN: we normalize the line
+    new_line, fixes = engine.normalize("aﻃbﻼ")
+    # THEN: only the lam-alif ligature is replaced
+    assert new_line == "aﻃbلا"  # noqa: RUF001
+    #  and both presentation form characters are reported at their columns
+    assert [(f.col_no, f.is_fixed, f.rule_name) for f in fixes] == [
+        (2, False, ""),
+        (4, True, "ʾalif lām [B]"),  # noqa: RUF001
+    ]
+
+
+@pytest.mark.parametrize(
+    ("character", "expected"),
+    [
+        ("a", _hook.char_map.ArabicUnicodeGroup.Unknown),
+        (chr(0x0628), _hook.char_map.ArabicUnicodeGroup.Arabic),
+        (chr(0x08A0), _hook.char_map.ArabicUnicodeGroup.ArabicExtendedA),
+        (chr(0xFDFA), _hook.char_map.ArabicUnicodeGroup.ArabicPresentationFormsA),
+        (chr(0xFEC3), _hook.char_map.ArabicUnicodeGroup.ArabicPresentationFormsB),
+        (chr(0xFF00), _hook.char_map.ArabicUnicodeGroup.Unknown),
+        (chr(0x10E60), _hook.char_map.ArabicUnicodeGroup.RumiNumeralSymbols),
+        (
+            chr(0x1EEFF),
+            _hook.char_map.ArabicUnicodeGroup.ArabicMathematicalAlphabeticSymbols,
+        ),
+    ],
+)
+def test_get_type(character: str, expected: _hook.char_map.ArabicUnicodeGroup):
+    # GIVEN: a character
+    # WHEN: we look up its unicode group
+    # THEN: we get the block it belongs to
+    assert _hook.char_map.ArabicUnicodeGroup.get_type(character) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("plain text", False),
+        ("بَابَ", False),
+        ("aﻃb", True),
+        ("aﻃb \U0001f600", True),
+    ],
+    ids=["ascii", "general form", "presentation form", "higher codepoint after"],
+)
+def test_is_contains_non_general_form(text: str, expected: bool):
+    # GIVEN: some text
+    # WHEN: we check it for characters not in their general form
+    # THEN: any character is enough, not just the highest codepoint
+    assert _hook.char_map.is_contains_non_general_form(text) is expected
+
+
+@pytest.mark.parametrize(
+    "raw_bytes",
+    [b"int main() {\r\n  return 0;\r\n}\r\n", "caf\xe9\n".encode("latin-1")],
+    ids=["no arabic", "not utf-8"],
+)
+def test_pre_scan_skips_file(raw_bytes: bytes):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a file without any presentation forms
+        test_file = pathlib.Path(tmp_folder) / "test.txt"
+        test_file.write_bytes(raw_bytes)
+        # WHEN: we run against the test file
+        return_code = generic_test(test_file)
+        # THEN: it passes and the file is left alone
+        assert return_code == ExitCode.OK
+        assert test_file.read_bytes() == raw_bytes
+
+
+@pytest.mark.parametrize(
+    ("raw_bytes", "expected_bytes"),
+    [
+        ("ﻃَﺎ\r\nﻟَﻤَﺎ\r\n".encode(), "طَا\r\nلَمَا\r\n".encode()),  # noqa: RUF001
+        ("ﻃَﺎ\n".encode("utf-8-sig"), "طَا\n".encode("utf-8-sig")),
+        ("ﷺ\r\n".encode("utf-8-sig"), "ﷺ\r\n".encode("utf-8-sig")),
+    ],
+    ids=["crlf", "bom", "nothing fixed"],
+)
+def test_output_preserves_file(raw_bytes: bytes, expected_bytes: bytes):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a file with a particular line ending and encoding
+        test_file = pathlib.Path(tmp_folder) / "test.txt"
+        test_file.write_bytes(raw_bytes)
+        # WHEN: we run against the test file
+        with mock.patch(
+            f"{PATCH_BASE}.{_hook.write_file_atomic.__name__}",
+            side_effect=_hook.write_file_atomic,
+        ) as patch_write:
+            generic_test(test_file, excluded_chars="(ﷺ)")
+        # THEN: the line endings and byte order mark are kept
+        assert test_file.read_bytes() == expected_bytes
+        #  and the file is only written when something changed
+        assert patch_write.call_count == int(raw_bytes != expected_bytes)
+        #  without leaving any temporary files behind
+        assert list(pathlib.Path(tmp_folder).iterdir()) == [test_file]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64])
+def test_streamed_matches_in_memory(
+    chunk_size: int, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: a file with multi-character fixes, long lines and mixed line endings
+    #  and characters left not fixed before others that are fixed, on one line
+    raw_bytes = (
+        "ﻼbﻃَﺎ\r\n" + "x" * 10 + "ﻼ\n" + "\r\n" + "ﻟَﻤَﺎﻼ" * 7 + "\r"  # noqa: RUF001
+    ).encode("utf-8-sig") + "aﷺbﻃَcﷺﻼ\nﷺend".encode()
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        in_memory_file = pathlib.Path(tmp_folder) / "in_memory.txt"
+        streamed_file = pathlib.Path(tmp_folder) / "streamed.txt"
+        in_memory_file.write_bytes(raw_bytes)
+        streamed_file.write_bytes(raw_bytes)
+        # WHEN: we run against the file all at once, and in chunks
+        expected_code = generic_test(in_memory_file)
+        expected_out = capsys.readouterr().out.replace(in_memory_file.name, "<file>")
+        return_code = generic_test(streamed_file, chunk_size=chunk_size)
+        out = capsys.readouterr().out.replace(streamed_file.name, "<file>")
+        # THEN: we get the same result, reports and output file
+        assert return_code == expected_code == ExitCode.FAIL
+        assert out == expected_out
+        assert streamed_file.read_bytes() == in_memory_file.read_bytes() != raw_bytes
+        #  without leaving any temporary files behind
+        assert len(list(pathlib.Path(tmp_folder).iterdir())) == 2
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 5, 7])
+@pytest.mark.parametrize(
+    ("custom_rules", "excluded_chars"),
+    [({"X": {"rule": {"X": "ﻃﻃ"}}}, ""), ({}, "(ﻃﻃ)")],
+    ids=["sequence", "excluded regex"],
+)
+def test_streamed_long_matches(
+    custom_rules: _hook.char_map.CHAR_MAP_TYPE,
+    excluded_chars: str,
+    chunk_size: int,
+    capsys: pytest.CaptureFixture[str],
+):
+    # GIVEN: long lines, with two-character matches where the chunks end
+    raw_bytes = ("abcﻃﻃdefghij\r\n" + "xﻃﻃ" * 5 + "\n").encode()
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        in_memory_file = pathlib.Path(tmp_folder) / "in_memory.txt"
+        streamed_file = pathlib.Path(tmp_folder) / "streamed.txt"
+        in_memory_file.write_bytes(raw_bytes)
+        streamed_file.write_bytes(raw_bytes)
+        # WHEN: we run against the file all at once, and in chunks
+        generic_test(in_memory_file, custom_rules, excluded_chars)
+        expected_out = capsys.readouterr().out.replace(in_memory_file.name, "<file>")
+        generic_test(streamed_file, custom_rules, excluded_chars, chunk_size)
+        out = capsys.readouterr().out.replace(streamed_file.name, "<file>")
+        # THEN: the matches are not split, we get the same reports and output file
+        assert out == expected_out
+        assert streamed_file.read_bytes() == in_memory_file.read_bytes()
+
+
+def test_prefetch_matches_read(capsys: pytest.CaptureFixture[str]):
+    # GIVEN: the same files twice, some of which need fixing
+    contents = ["ﻃَﺎ\n", "بَابَ\n", "x\nﻟَﻤَﺎ\r\n"]  # noqa: RUF001
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        results = []
+        for folder_name, extra_args in (("read", []), ("prefetched", ["--prefetch=2"])):
+            folder = pathlib.Path(tmp_folder) / folder_name
+            folder.mkdir()
+            files = []
+            for idx, content in enumerate(contents):
+                file = folder / f"file_{idx}.txt"
+                file.write_bytes(content.encode())
+                files.append(file)
+            # WHEN: we run against them, reading them as we go and read ahead
+            return_code = _hook.ArabicPresentationFormChecker().run(
+                [*extra_args, *map(str, files)]
+            )
+            out = capsys.readouterr().out.replace(folder_name, "<folder>")
+            results.append((return_code, out, [f.read_bytes() for f in files]))
+        # THEN: we get the same result, reports and output files
+        assert results[0] == results[1]
+        assert results[0][0] == ExitCode.FAIL
+
+
+@pytest.mark.parametrize(
+    ("text", "kwargs"),
+    [
+        ("ﻃَﺎ\r\nx\rﻟَﻤَﺎ ﷺ\n\nﻼﻼ", {}),  # noqa: RUF001
+        ("ﻃَﺎ ﷺ\nﷺ\n", {"excluded_chars": "(ﷺ)"}),
+        ("ﷺ\n\nx ﷺ ﻃ\n", {"excluded_chars": "[ﷺ]"}),
+        ("ﻃَﺎ ﷺﷺ\nﷺ ﻃ\n", {"excluded_chars": "ﷺﷺ"}),
+        ("ﻃَﺎ\nﻃ", {"custom_rules": {"ṭāʾ": {"rule": {"ط": "(NOPE)"}}}}),
+        ("ﻟﺎ ﻃ\n", {"custom_rules": {"lam alif": {"rule": {"لا": "(ﻟﺎ)"}}}}),
+        ("ﻃ\nplain\nﻃ\n", {"diff": [LineRange(3, 3)]}),
+        ("ﻃَﺎ ﷺ\n" * 3, {"summary": True}),
+        (chr(0xFEFF) + "ﻃ\r\n\rxﻃ\r", {}),
+        ("plain\n", {}),
+    ],
+    ids=[
+        "line endings",
+        "excluded",
+        "excluded set",
+        "excluded regex",
+        "custom rules",
+        "sequence rules",
+        "diff",
+        "summary",
+        "bom",
+        "nothing",
+    ],
+)
+@pytest.mark.parametrize("backend", ["numpy", "bytes"])
+def test_backend_matches_python(
+    text: str, kwargs: dict, backend: str, capsys: pytest.CaptureFixture[str]
+):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        results = []
+        for file_backend in ("python", backend):
+            # GIVEN: a file
+            test_file = pathlib.Path(tmp_folder) / f"{file_backend}.txt"
+            test_file.write_bytes(text.encode())
+            file_kwargs = dict(kwargs)
+            if "diff" in kwargs:
+                file_kwargs["diff"] = ChangedLines({str(test_file): kwargs["diff"]})
+            # WHEN: we run against it with each backend
+            return_code = generic_test(test_file, backend=file_backend, **file_kwargs)
+            out = capsys.readouterr().out.replace(str(test_file), "<file>")
+            results.append((return_code, out, test_file.read_bytes()))
+    # THEN: they give the same result, reports and output file
+    assert results[0] == results[1]
+
+
+def test_numpy_backend_fallback():
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a file, and NumPy is not installed
+        test_file = pathlib.Path(tmp_folder) / "test.txt"
+        test_file.write_text("ﻃَﺎ\n", encoding="utf-8")
+        with mock.patch.dict("sys.modules", {"numpy": None}):
+            sys.modules.pop(f"{PATCH_BASE}.vectorized", None)
+            # WHEN: we ask for the numpy backend
+            return_code = generic_test(test_file, backend="numpy")
+        # THEN: the file is fixed by the python one
+        assert return_code == ExitCode.FAIL
+        assert test_file.read_text(encoding="utf-8") == "طَا\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1024, 4])
+def test_only_changed_lines(chunk_size: int):
+    # GIVEN: a file with presentation forms on two lines, of which one changed
+    raw_bytes = "ﻃ\nplain\nﻃ\n".encode()
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        test_file = pathlib.Path(tmp_folder) / "test.txt"
+        test_file.write_bytes(raw_bytes)
+        changes = ChangedLines({str(test_file): [LineRange(3, 3)]})
+        # WHEN: we only check what changed
+        return_code = generic_test(test_file, chunk_size=chunk_size, diff=changes)
+        # THEN: only the changed line is fixed
+        assert return_code == ExitCode.FAIL
+        assert test_file.read_text() == "ﻃ\nplain\nط\n"
+        # WHEN: the file did not change
+        test_file.write_bytes(raw_bytes)
+        return_code = generic_test(test_file, diff=ChangedLines())
+        # THEN: it is not checked
+        assert return_code == ExitCode.OK
+        assert test_file.read_bytes() == raw_bytes
+
+
+@pytest.mark.parametrize(
+    ("summary", "max_reports", "expected_out"),
+    [
+        (
+            False,
+            2,
+            [
+                "[Fixed] <file>:1:1 [ط (['\\\\u0637'])]",
+                "[Fixed] <file>:1:3 [ا (['\\\\u0627'])]",  # noqa: RUF001
+                "<file>: 5 more reports not shown (--max-reports 2)",
+            ],
+        ),
+        (
+            True,
+            None,
+            [
+                "<file>: 5 Fixed, 1 Not Fixed, 1 Incomplete",
+                "  [Fixed] lām: 1",
+                "  [Fixed] mīm: 1",
+                "  [Fixed] ʾalif: 2",  # noqa: RUF001
+                "  [Fixed] ṭāʾ: 1",
+                "  [Incomplete] lines: 1",
+                "  [Not Fixed] U+FDFA: 1",
+            ],
+        ),
+    ],
+    ids=["max reports", "summary"],
+)
+def test_reports(
+    summary: bool,
+    max_reports: int | None,
+    expected_out: list[str],
+    capsys: pytest.CaptureFixture[str],
+):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a file with several fixes
+        test_file = pathlib.Path(tmp_folder) / "test.txt"
+        test_file.write_text("ﻃَﺎﻟَﻤَﺎ ﷺ\n", encoding="utf-8")
+        # WHEN: we run against the test file
+        generic_test(test_file, summary=summary, max_reports=max_reports)
+    # THEN: the reports are shortened as requested
+    out = capsys.readouterr().out.replace(str(test_file), "<file>")
+    assert out.splitlines() == expected_out
@@ -0,0 +1,165 @@
+"""Synthetic corpora for the benchmarks, generated offline.
+
+Every corpus is generated from a fixed seed, so that runs are comparable.
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+import random
+
+LICENSE_CONFIG = {
+    "c_license": [
+        "/* =========================================================================",
+        "    Unity Project - A Test Framework for C",
+        "    Copyright (c) 2007-21 Mike Karlesky, Mark VanderVoord, Greg Williams",
+        "    [Released under MIT License. Please refer to license.txt for details]",
+        "============================================================================ */",  # noqa: E501
+    ],
+    "c_footer": ["/*-----------------------------------------------*/"],
+}
+
+C_BODY_LINES = [
+    "#include <stdio.h>",
+    "",
+    "static int add(int a, int b)",
+    "{",
+    "    return a + b;",
+    "}",
+    "",
+    "int main(void)",
+    "{",
+    '    printf("%d\\n", add(1, 2));',
+    "    return 0;",
+    "}",
+]
+
+# General form letters, and their presentation forms.
+ARABIC_LETTERS: dict[int, range] = {
+    0x0627: range(0xFE8D, 0xFE8F),  # alif
+    0x0628: range(0xFE8F, 0xFE93),  # ba
+    0x062A: range(0xFE95, 0xFE99),  # ta
+    0x0644: range(0xFEDD, 0xFEE1),  # lam
+    0x0645: range(0xFEE1, 0xFEE5),  # mim
+    0x0646: range(0xFEE5, 0xFEE9),  # nun
+}
+
+_WRITE_BLOCK_SIZE = 1024 * 1024
+
+
+def write_config(directory: pathlib.Path) -> str:
+    """Write the header/footer config.
+
+    Args:
+        directory (pathlib.Path): Where to write it.
+
+    Returns:
+        str: The path of the config file.
+    """
+    config_file = directory / "config.json"
+    config_file.write_text(json.dumps(LICENSE_CONFIG), encoding="utf-8")
+    return str(config_file)
+
+
+def small_c_files(
+    directory: pathlib.Path, n_files: int, with_license: bool
+) -> list[pathlib.Path]:
+    """Write many small C files.
+
+    Args:
+        directory (pathlib.Path): Where to write them.
+        n_files (int): How many files.
+        with_license (bool): Start every file with the license header.
+
+    Returns:
+        list[pathlib.Path]: The files.
+    """
+    header = LICENSE_CONFIG["c_license"] if with_license else []
+    lines = [*header, *C_BODY_LINES, *LICENSE_CONFIG["c_footer"]]
+    content = ("\n".join(lines) + "\n").encode()
+    files = []
+    for idx in range(n_files):
+        file = directory / f"file_{idx}.c"
+        file.write_bytes(content)
+        files.append(file)
+    return files
+
+
+def long_line_file(directory: pathlib.Path, size: int) -> list[pathlib.Path]:
+    """Write a file that is a single line, e.g. minified code.
+
+    Args:
+        directory (pathlib.Path): Where to write it.
+        size (int): Size of the file in bytes.
+
+    Returns:
+        list[pathlib.Path]: The file.
+    """
+    file = directory / "long_line.c"
+    _write_repeated(file, b"x = 1; ", size)
+    return [file]
+
+
+def large_file(directory: pathlib.Path, size: int) -> list[pathlib.Path]:
+    """Write a file of many short lines, with the license header.
+
+    Args:
+        directory (pathlib.Path): Where to write it.
+        size (int): Size of the file in bytes, roughly.
+
+    Returns:
+        list[pathlib.Path]: The file.
+    """
+    file = directory / "large.c"
+    header = ("\n".join(LICENSE_CONFIG["c_license"]) + "\n").encode()
+    _write_repeated(file, ("\n".join(C_BODY_LINES) + "\n").encode(), size, header)
+    return [file]
+
+
+def arabic_files(
+    directory: pathlib.Path, n_files: int, size: int, density: float
+) -> list[pathlib.Path]:
+    """Write files of Arabic text, with some letters in a presentation form.
+
+    Args:
+        directory (pathlib.Path): Where to write them.
+        n_files (int): How many files.
+        size (int): Size of every file in characters, roughly.
+        density (float): The fraction of letters in a presentation form.
+
+    Returns:
+        list[pathlib.Path]: The files.
+    """
+    rng = random.Random(f"{size}:{density}")
+    general = list(ARABIC_LETTERS)
+    files = []
+    for idx in range(n_files):
+        lines = []
+        n_chars = 0
+        while n_chars < size:
+            words = []
+            for _ in range(10):
+                word = ""
+                for codepoint in rng.choices(general, k=rng.randint(2, 6)):
+                    if rng.random() < density:
+                        codepoint = rng.choice(ARABIC_LETTERS[codepoint])
+                    word += chr(codepoint)
+                words.append(word)
+            line = " ".join(words)
+            lines.append(line)
+            n_chars += len(line) + 1
+        file = directory / f"arabic_{idx}.txt"
+        file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        files.append(file)
+    return files
+
+
+def _write_repeated(
+    file: pathlib.Path, block: bytes, size: int, header: bytes = b""
+) -> None:
+    repeated = block * max(1, _WRITE_BLOCK_SIZE // len(block))
+    with file.open("wb") as fp:
+        written = fp.write(header)
+        while written < size:
+            written += fp.write(repeated[: size - written])
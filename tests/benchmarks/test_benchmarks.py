@@ -0,0 +1,190 @@
+"""Benchmarks of the hooks, on synthetic corpora.
+
+They are slow, so they only run when ``PRE_COMMIT_HOOKS_BENCHMARK`` is set, e.g.::
+
+    PRE_COMMIT_HOOKS_BENCHMARK=1 pytest tests/benchmarks -s
+
+The throughput of every benchmark is compared with the baseline in
+``.benchmarks/baseline.json``, and a benchmark fails if it is much slower.
+Set ``PRE_COMMIT_HOOKS_BENCHMARK_SAVE`` to save the results as the new baseline.
+Set ``PRE_COMMIT_HOOKS_BENCHMARK_LARGE_MB`` for the size of the large files, e.g.
+``4096`` to benchmark multi-GB files.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import pathlib
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from typing import NamedTuple
+
+import pytest
+
+from pre_commit_hooks.arabic_presentation_form import ArabicPresentationFormChecker
+from pre_commit_hooks.check_header_footer import HeaderFooterChecker
+from pre_commit_hooks.util import ABCHook
+
+from . import corpora
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("PRE_COMMIT_HOOKS_BENCHMARK"),
+    reason="Set PRE_COMMIT_HOOKS_BENCHMARK to run the benchmarks.",
+)
+
+BASELINE_FILE = pathlib.Path(
+    os.environ.get(
+        "PRE_COMMIT_HOOKS_BENCHMARK_BASELINE",
+        pathlib.Path(__file__).parents[2] / ".benchmarks" / "baseline.json",
+    )
+)
+# How much slower than the baseline a benchmark may be, timings are noisy.
+TOLERANCE = 0.3
+ROUNDS = 3
+N_SMALL_FILES = 2000
+LARGE_SIZE = int(os.environ.get("PRE_COMMIT_HOOKS_BENCHMARK_LARGE_MB", "64")) << 20
+
+CorpusFactory = Callable[[pathlib.Path], list[pathlib.Path]]
+
+
+class Throughput(NamedTuple):
+    """The result of a benchmark."""
+
+    files_per_s: float
+    mb_per_s: float
+
+    def __str__(self) -> str:
+        """Format for the benchmark report."""
+        return f"{self.files_per_s:12.1f} files/s {self.mb_per_s:10.2f} MB/s"
+
+
+@pytest.fixture(scope="session")
+def results() -> Iterator[dict[str, Throughput]]:
+    results: dict[str, Throughput] = {}
+    yield results
+    if os.environ.get("PRE_COMMIT_HOOKS_BENCHMARK_SAVE") and results:
+        baseline = load_baseline()
+        baseline.update({name: r._asdict() for name, r in results.items()})
+        BASELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+
+
+def load_baseline() -> dict[str, dict[str, float]]:
+    try:
+        return json.loads(BASELINE_FILE.read_text())  # type: ignore[no-any-return]
+    except (OSError, ValueError):
+        return {}
+
+
+def measure(hook: ABCHook, argv: list[str], make_corpus: CorpusFactory) -> Throughput:
+    """Run a hook on a fresh corpus, a few times, and keep the best run.
+
+    Args:
+        hook (ABCHook): The hook.
+        argv (list[str]): The arguments, other than the files.
+        make_corpus (CorpusFactory): Writes the files into a directory.
+
+    Returns:
+        Throughput: Of the best run.
+    """
+    best = float("inf")
+    for _ in range(ROUNDS):
+        with tempfile.TemporaryDirectory() as tmp_folder:
+            # The hooks may fix the files, so every run gets a new corpus.
+            files = make_corpus(pathlib.Path(tmp_folder))
+            n_bytes = sum(f.stat().st_size for f in files)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                hook.run([*argv, *map(str, files)])
+                best = min(best, time.perf_counter() - start)
+    return Throughput(len(files) / best, n_bytes / best / (1 << 20))
+
+
+def check_against_baseline(
+    name: str, throughput: Throughput, results: dict[str, Throughput]
+) -> None:
+    results[name] = throughput
+    print(f"\n{name:60} {throughput}")
+    baseline = load_baseline().get(name)
+    if baseline is not None:
+        assert throughput.mb_per_s >= baseline["mb_per_s"] * (1 - TOLERANCE), (
+            f"{name} regressed: {throughput} vs {Throughput(**baseline)}"
+        )
+
+
+HEADER_FOOTER_CORPORA: dict[str, CorpusFactory] = {
+    "small files with license": lambda d: corpora.small_c_files(
+        d, N_SMALL_FILES, with_license=True
+    ),
+    "small files without license": lambda d: corpora.small_c_files(
+        d, N_SMALL_FILES, with_license=False
+    ),
+    "long single line": lambda d: corpora.long_line_file(d, LARGE_SIZE),
+    "large file": lambda d: corpora.large_file(d, LARGE_SIZE),
+}
+
+
+@pytest.mark.parametrize("corpus", HEADER_FOOTER_CORPORA)
+def test_header_footer(corpus: str, results: dict[str, Throughput]):
+    # GIVEN: a corpus, in a directory with the config
+    def make(directory: pathlib.Path) -> list[pathlib.Path]:
+        HEADER_FOOTER_CORPORA[corpus](directory)
+        return sorted(directory.glob("*.c"))
+
+    with tempfile.TemporaryDirectory() as config_folder:
+        config = corpora.write_config(pathlib.Path(config_folder))
+        # WHEN: we check the header and footer
+        throughput = measure(
+            HeaderFooterChecker(),
+            [
+                f"--header-config={config}:c_license",
+                f"--footer-config={config}:c_footer",
+            ],
+            make,
+        )
+    # THEN: it is not slower than the baseline
+    check_against_baseline(f"check-header-footer: {corpus}", throughput, results)
+
+
+ARABIC_CORPORA: dict[str, CorpusFactory] = {
+    "small files, no presentation forms": lambda d: corpora.arabic_files(
+        d, N_SMALL_FILES, size=1000, density=0
+    ),
+    "small files, 1% presentation forms": lambda d: corpora.arabic_files(
+        d, N_SMALL_FILES, size=1000, density=0.01
+    ),
+    "large file, no presentation forms": lambda d: corpora.arabic_files(
+        d, 1, size=LARGE_SIZE // 2, density=0
+    ),
+    "large file, 0.1% presentation forms": lambda d: corpora.arabic_files(
+        d, 1, size=LARGE_SIZE // 2, density=0.001
+    ),
+    "large file, 50% presentation forms": lambda d: corpora.arabic_files(
+        d, 1, size=LARGE_SIZE // 2, density=0.5
+    ),
+}
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy", "bytes"])
+@pytest.mark.parametrize("corpus", ARABIC_CORPORA)
+def test_arabic_presentation_form(
+    corpus: str, backend: str, results: dict[str, Throughput]
+):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    # GIVEN: a corpus
+    # WHEN: we fix the presentation forms, only reporting a summary
+    throughput = measure(
+        ArabicPresentationFormChecker(),
+        ["--summary", f"--backend={backend}"],
+        ARABIC_CORPORA[corpus],
+    )
+    # THEN: it is not slower than the baseline
+    name = "arabic-presentation-form"
+    if backend != "python":
+        name += f" ({backend})"
+    check_against_baseline(f"{name}: {corpus}", throughput, results)
@@ -2,8 +2,14 @@
 
 from __future__ import annotations
 
+import io
 import json
+import os
 import pathlib
+import re
+import shutil
+import subprocess
+import tempfile
 import typing
 from unittest import mock
 
@@ -51,8 +57,62 @@ def test_rule_config():
     assert set(rules.keys()) == set(DUMMY_CONFIG.keys())
 
 
+def test_rule_registry():
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a config file
+        config_file = pathlib.Path(tmp_folder) / "config.json"
+        config_file.write_text(json.dumps(DUMMY_CONFIG))
+        registry = _hook.RuleRegistry()
+        # WHEN: the header and footer configs enable rules from it
+        with mock.patch(
+            f"{PATCH_BASE}.json.load", side_effect=json.load
+        ) as patch_json_load:
+            header = registry.get_rules(
+                _hook.RuleConfig.parse_arg(f"{config_file}:license,doxygen")
+            )
+            footer = registry.get_rules(
+                _hook.RuleConfig.parse_arg(f"{config_file}:doxygen")
+            )
+            # THEN: the file is parsed once, and the rule they share is compiled once
+            assert patch_json_load.call_count == 1
+            assert header["doxygen"] is footer["doxygen"]
+
+            # GIVEN: the config file changes
+            config_file.write_text(json.dumps({"doxygen": ["/// @{"]}))
+            os.utime(config_file, ns=(0, 0))
+            # WHEN: the rules are looked up again
+            footer = registry.get_rules(
+                _hook.RuleConfig.parse_arg(f"{config_file}:doxygen")
+            )
+            # THEN: the file is parsed again, and the rule is the new one
+            assert patch_json_load.call_count == 2
+            assert footer["doxygen"].pattern == re.escape("/// @{")
+
+
+def test_rule_registry_relative_paths(monkeypatch: pytest.MonkeyPatch):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: config files with the same relative path and mtime, in two folders
+        folders = [pathlib.Path(tmp_folder) / name for name in ("r1", "r2")]
+        for folder, line in zip(folders, ("/// @{", "/// @}")):
+            folder.mkdir()
+            (folder / "c.json").write_text(json.dumps({"doxygen": [line]}))
+            os.utime(folder / "c.json", ns=(0, 0))
+        registry = _hook.RuleRegistry()
+        config = _hook.RuleConfig.parse_arg("c.json:doxygen")
+        # WHEN: the rules are looked up from each folder, as a server does
+        patterns = []
+        for folder in folders:
+            monkeypatch.chdir(folder)
+            patterns.append(registry.get_rules(config)["doxygen"].pattern)
+        # THEN: each folder gets the rules of its own config file
+        assert patterns == [re.escape("/// @{"), re.escape("/// @}")]
+
+
 def generic_test(
-    test_file: pathlib.Path, header_checks: list[str], footer_checks: list[str]
+    test_file: pathlib.Path,
+    header_checks: list[str],
+    footer_checks: list[str],
+    diff: _hook.ChangedLines | None = None,
 ) -> ExitCode:
     """Helper function to coordinate the running of the test.
 
@@ -68,7 +128,7 @@ def generic_test(
     h_rules = {k: v for k, v in rules.items() if k in header_checks}
     f_rules = {k: v for k, v in rules.items() if k in footer_checks}
     with mock.patch(
-        f"{PATCH_BASE}.{_hook.get_rules.__name__}",  # type: ignore[attr-defined]
+        f"{PATCH_BASE}.{_hook.get_rules.__name__}",
         side_effect=[h_rules, f_rules],
     ):
         parsed_args = _hook.HeaderFooterArgs(
@@ -77,6 +137,8 @@ def generic_test(
             footer_lines=15,
             header_config="",
             footer_config="",
+            max_bytes=1024 * 1024,
+            diff=diff,
         )
         argparser = _hook.HeaderFooterChecker()
         return_code = argparser.implementation(test_file, parsed_args)
@@ -127,13 +189,26 @@ def test_default_args():
     )
 
 
-def test_both_header_and_footer_runs():
-    with mock.patch(
-        f"{PATCH_BASE}.{_hook.check_rules_in_file.__name__}",
-        side_effect=_hook.check_rules_in_file,
-    ) as patch_check_rules:
+@pytest.mark.parametrize(
+    ("use_mmap", "check_function"),
+    [
+        (True, _hook.check_rules_in_buffer),
+        (False, _hook.check_rules_in_file),
+    ],
+    ids=["mmap", "read"],
+)
+def test_both_header_and_footer_runs(use_mmap: bool, check_function: typing.Any):
+    with (
+        mock.patch(
+            f"{PATCH_BASE}.mmap.mmap",
+            side_effect=_hook.mmap.mmap if use_mmap else ValueError,
+        ),
+        mock.patch(
+            f"{PATCH_BASE}.{check_function.__name__}", side_effect=check_function
+        ) as patch_check_rules,
+    ):
         # GIVEN: both 1 header and 1 footer rule
-        # WHEN: we run the checks
+        # WHEN: we run the checks, with the file mapped or read
         return_code = generic_test(
             TEST_FILES["unity"].path,
             header_checks=["c_license"],
@@ -142,3 +217,160 @@ def test_both_header_and_footer_runs():
         # THEN: the rule checking function is called twice
         assert patch_check_rules.call_count == 2
     assert return_code == ExitCode.OK
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"),
+    [
+        (b"/// @}\n", ExitCode.OK),
+        (b"/// @}   \r\nline\r\n", ExitCode.OK),
+        (b"\xff\xfe binary\n/// @}", ExitCode.OK),
+        (b"", ExitCode.FAIL),
+        (b"/// @\n}\n", ExitCode.FAIL),
+        (b"line\n" * 20 + b"/// @}\n" + b"line\n" * 20, ExitCode.FAIL),
+    ],
+    ids=["plain", "crlf", "binary", "empty", "split", "middle"],
+)
+def test_mmap_and_prefetch_match_read(content: bytes, expected: ExitCode):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a file
+        tmp_file = pathlib.Path(tmp_folder) / "tmp_file.txt"
+        tmp_file.write_bytes(content)
+        # WHEN: we check it mapped, read, and read ahead
+        return_codes = []
+        for side_effect, prefetched in (
+            (_hook.mmap.mmap, None),
+            (ValueError, None),
+            (ValueError, content),
+        ):
+            with (
+                mock.patch(f"{PATCH_BASE}.mmap.mmap", side_effect=side_effect),
+                mock.patch.object(
+                    _hook.HeaderFooterChecker, "prefetched", return_value=prefetched
+                ),
+            ):
+                return_codes.append(
+                    generic_test(
+                        tmp_file, header_checks=["doxygen"], footer_checks=["doxygen"]
+                    )
+                )
+        # THEN: all give the expected exit code
+        assert return_codes == [expected, expected, expected]
+
+
+def test_rule_matcher():
+    # GIVEN: rules that overlap with each other, and one that is not in the text
+    rules = {
+        name: re.compile(re.escape(text))
+        for name, text in {
+            "first": "line 1\nline 2",
+            "overlapping": "line 2\nline 3",
+            "inside": "ine",
+            "missing": "line 4",
+        }.items()
+    }
+    # WHEN: we look for the rules
+    matcher = _hook.get_matcher(rules)
+    missing = matcher.missing("line 1\nline 2\nline 3")
+    # THEN: only the rule that is not in the text is missing
+    assert missing == ["missing"]
+    #  and the matcher is only built once
+    assert _hook.get_matcher(dict(rules)) is matcher
+
+
+class _NamedBytesIO(io.BytesIO):
+    name = "in-memory"
+
+
+def test_check_rules_in_file_stops_early():
+    # GIVEN: a file where every rule is found in the first lines
+    rules = {"doxygen": re.compile(re.escape("/// @}"))}
+    f = _NamedBytesIO(b"/// @}\n" + b"line\n" * 1000)
+    # WHEN: we check the file
+    return_code = _hook.check_rules_in_file(f, max_lines=1000, rules=rules)  # type: ignore[arg-type]
+    # THEN: it passes, without reading the rest of the file
+    assert return_code == ExitCode.OK
+    assert f.tell() < 100
+
+
+def test_check_rules_in_file_bounded_bytes():
+    # GIVEN: a file with a huge first line, and the rule after it
+    rules = {"doxygen": re.compile(re.escape("/// @}"))}
+    f = _NamedBytesIO(b"x" * 100_000 + b"\n/// @}\n")
+    # WHEN: we check at most a few bytes of it
+    return_code = _hook.check_rules_in_file(  # type: ignore[arg-type]
+        f, max_lines=10, rules=rules, max_bytes=1000
+    )
+    # THEN: the rule is not found, and no more than those bytes were read
+    assert return_code == ExitCode.FAIL
+    assert f.tell() == 1000
+
+
+def test_check_rules_in_file_invalid_utf8():
+    # GIVEN: a file with bytes that are not UTF-8 before the rule
+    rules = {"doxygen": re.compile(re.escape("/// @}"))}
+    f = _NamedBytesIO(b"\xff\xfe binary\n/// @}\n")
+    # WHEN: we check the file
+    return_code = _hook.check_rules_in_file(f, max_lines=10, rules=rules)  # type: ignore[arg-type]
+    # THEN: the rule is still found
+    assert return_code == ExitCode.OK
+
+
+def git(*args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+@pytest.mark.parametrize(
+    ("changed_line", "max_bytes", "expected"),
+    [
+        (1, 1024, ExitCode.FAIL),
+        (30, 1024, ExitCode.OK),
+        (59, 1024, ExitCode.FAIL),
+        (None, 1024, ExitCode.OK),
+        (30, 200, ExitCode.FAIL),
+    ],
+    ids=["header", "middle", "footer", "unchanged", "past max bytes"],
+)
+def test_diff_git(
+    changed_line: int | None,
+    max_bytes: int,
+    expected: ExitCode,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a committed file without the header and footer
+        repo = pathlib.Path(tmp_folder) / "repo"
+        repo.mkdir()
+        monkeypatch.chdir(repo)
+        config_file = pathlib.Path(tmp_folder) / "config.json"
+        config_file.write_text(json.dumps(DUMMY_CONFIG))
+        lines = [f"line {idx}" for idx in range(1, 61)]
+        pathlib.Path("file.c").write_text("\n".join(lines) + "\n")
+        git("init", "-q")
+        git("add", "file.c")
+        git("commit", "-q", "-m", "init")
+        #  and a staged change to one of its lines
+        if changed_line is not None:
+            lines[changed_line - 1] = "changed"
+            pathlib.Path("file.c").write_text("\n".join(lines) + "\n")
+            git("add", "file.c")
+        # WHEN: we only check what changed
+        return_code = _hook.HeaderFooterChecker().run(
+            [
+                f"--header-config={config_file}:doxygen",
+                f"--footer-config={config_file}:doxygen",
+                "--lines=10",
+                "--footer-lines=5",
+                f"--max-bytes={max_bytes}",
+                "--diff=git",
+                "file.c",
+            ]
+        )
+        # THEN: the header and footer are only checked if they changed,
+        #  a change past the lines counted being taken as one of the footer
+        assert return_code == expected
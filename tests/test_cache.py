@@ -0,0 +1,87 @@
+"""Test the result cache."""
+
+from __future__ import annotations
+
+import pathlib
+import tempfile
+
+import pytest
+
+from pre_commit_hooks.cache import ResultCache
+
+
+@pytest.fixture
+def tmp_folder():
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        yield pathlib.Path(tmp_folder)
+
+
+@pytest.mark.parametrize("by_stat", [False, True], ids=["content", "stat"])
+def test_key(tmp_folder: pathlib.Path, by_stat: bool):
+    # GIVEN: a file and caches with different fingerprints
+    test_file = tmp_folder / "test.txt"
+    test_file.write_text("a")
+    cache = ResultCache(tmp_folder / "cache.json", "1", 10, by_stat=by_stat)
+    same_cache = ResultCache(tmp_folder / "cache.json", "1", 10, by_stat=by_stat)
+    other_cache = ResultCache(tmp_folder / "cache.json", "2", 10, by_stat=by_stat)
+    # WHEN: we get the keys of the file
+    key = cache.key(test_file)
+    # THEN: the key depends on the fingerprint
+    assert key is not None
+    assert key == same_cache.key(test_file)
+    assert key != other_cache.key(test_file)
+    # WHEN: we change the file
+    test_file.write_text("ab")
+    # THEN: the key changes too
+    assert key != cache.key(test_file)
+    #  and files we cannot read are never cached
+    assert cache.key(tmp_folder / "missing.txt") is None
+    assert not cache.is_ok(None)
+
+
+def test_save_and_evict(tmp_folder: pathlib.Path):
+    # GIVEN: two caches sharing a file, saving at the same time
+    cache_file = tmp_folder / "sub_folder" / "cache.json"
+    cache = ResultCache(cache_file, "", max_entries=3)
+    other_cache = ResultCache(cache_file, "", max_entries=3)
+    # WHEN: both add entries and save
+    cache.add("a")
+    cache.add("b")
+    other_cache.add("c")
+    other_cache.add(None)
+    cache.save()
+    other_cache.save()
+    # THEN: the entries of both are kept
+    assert all(ResultCache(cache_file, "", 3).is_ok(k) for k in ("a", "b", "c"))
+    # WHEN: we go over the maximum number of entries
+    cache = ResultCache(cache_file, "", max_entries=3)
+    cache.add("d")
+    cache.save()
+    # THEN: the least recently used entry is evicted
+    cache = ResultCache(cache_file, "", max_entries=3)
+    assert [cache.is_ok(k) for k in ("a", "b", "c", "d")] == [False, True, True, True]
+
+
+def test_cache_size_zero(tmp_folder: pathlib.Path):
+    # GIVEN: a cache that may not keep any entry
+    cache_file = tmp_folder / "cache.json"
+    cache = ResultCache(cache_file, "", max_entries=0)
+    # WHEN: entries are added and saved
+    cache.add("a")
+    cache.add("b")
+    cache.save()
+    # THEN: none of them are kept
+    assert not ResultCache(cache_file, "", max_entries=0).is_ok("a")
+
+
+def test_corrupt_cache(tmp_folder: pathlib.Path):
+    # GIVEN: a cache file that is not valid
+    cache_file = tmp_folder / "cache.json"
+    cache_file.write_text("[not json")
+    # WHEN: we load it
+    cache = ResultCache(cache_file, "", max_entries=3)
+    # THEN: it is treated as empty, and replaced on save
+    assert not cache.is_ok("a")
+    cache.add("a")
+    cache.save()
+    assert ResultCache(cache_file, "", max_entries=3).is_ok("a")
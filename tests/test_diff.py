@@ -0,0 +1,106 @@
+"""Test the parsing of diffs."""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+from pre_commit_hooks import diff
+from pre_commit_hooks.diff import LineRange
+
+DIFF = """\
+diff --git a/changed.c b/changed.c
+index 1111111..2222222 100644
+--- a/changed.c
++++ b/changed.c
+@@ -10,0 +11,2 @@ int main(void)
++int a;
++int b;
+@@ -3 +4 @@
+-old
++new
+@@ -20,2 +21,0 @@
+-removed
+-removed
+diff --git a/new.c b/new.c
+new file mode 100644
+--- /dev/null
++++ b/new.c
+@@ -0,0 +1,3 @@
++1
++2
++3
+diff --git a/deleted.c b/deleted.c
+deleted file mode 100644
+--- a/deleted.c
++++ /dev/null
+@@ -1 +0,0 @@
+-gone
+diff --git "a/sp\\303\\251cial\\tname.c" "b/sp\\303\\251cial\\tname.c"
+--- "a/sp\\303\\251cial\\tname.c"
++++ "b/sp\\303\\251cial\\tname.c"
+@@ -0,0 +1 @@
++x
+diff --git "a/é\\"q.txt" "b/é\\"q.txt"
+--- "a/é\\"q.txt"
++++ "b/é\\"q.txt"
+@@ -0,0 +1 @@
++y
+"""
+
+
+def test_parse_diff():
+    # GIVEN: a diff with added, changed and removed lines
+    # WHEN: we parse it
+    changes = diff.parse_diff(DIFF)
+    # THEN: we get the lines that changed in the new version of every file
+    assert changes == {
+        "changed.c": [LineRange(4, 4), LineRange(11, 12), LineRange(22, 22)],
+        "new.c": [LineRange(1, 3)],
+        "spécial\tname.c": [LineRange(1, 1)],
+        'é"q.txt': [LineRange(1, 1)],
+    }
+    #  and files are found however their path is written
+    assert changes.get_ranges("./new.c") == [LineRange(1, 3)]
+    assert changes.get_ranges("unchanged.c") == []
+
+
+@pytest.mark.parametrize(
+    ("line_no", "expected"),
+    [(1, False), (4, True), (5, False), (11, True), (12, True), (13, False)],
+)
+def test_is_line_changed(line_no: int, expected: bool):
+    # GIVEN: the ranges of lines that changed
+    ranges = [LineRange(4, 4), LineRange(11, 12)]
+    # WHEN: we check a line
+    # THEN: it changed if it is in one of the ranges
+    assert diff.is_line_changed(ranges, line_no) == expected
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_load_diff_git(monkeypatch: pytest.MonkeyPatch):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a repository whose config changes the prefixes of the paths
+        monkeypatch.chdir(tmp_folder)
+        subprocess.run(["git", "init", "-q"], check=True)
+        subprocess.run(["git", "config", "diff.mnemonicPrefix", "true"], check=True)
+        #  and a staged file whose name git quotes
+        pathlib.Path('é"q.txt').write_text("1\n2\n")
+        subprocess.run(["git", "add", "."], check=True)
+        # WHEN: we load the staged changes
+        changes = diff.load_diff("git")
+    # THEN: the file is found by its name
+    assert changes == {'é"q.txt': [LineRange(1, 2)]}
+
+
+def test_load_diff_missing_file():
+    # GIVEN: a diff file that does not exist
+    # WHEN: we load it
+    # THEN: it is reported as an invalid argument
+    with pytest.raises(argparse.ArgumentTypeError):
+        diff.load_diff("does-not-exist.diff")
@@ -0,0 +1,171 @@
+"""Test the server, and its client."""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import socket
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from unittest import mock
+
+import pytest
+
+from pre_commit_hooks import client, server
+from pre_commit_hooks.util import ExitCode
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not supported."
+)
+
+CONFIG = {"doxygen": ["/// @}"]}
+
+
+@pytest.fixture
+def tmp_folder() -> Iterator[pathlib.Path]:
+    # Short, as the path of a Unix socket is limited to about 100 characters.
+    with tempfile.TemporaryDirectory(dir="/tmp") as tmp_folder:
+        yield pathlib.Path(tmp_folder)
+
+
+@pytest.fixture
+def socket_path(tmp_folder: pathlib.Path) -> Iterator[str]:
+    socket_path = str(tmp_folder / "hooks.sock")
+    thread = threading.Thread(target=server.serve, args=(socket_path, 10))
+    thread.start()
+    # Until the server accepts connections, not only until the socket exists.
+    while True:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+                break
+            except OSError:
+                time.sleep(0.01)
+    yield socket_path
+    server.main(["--socket", socket_path, "stop"])
+    thread.join()
+
+
+def write_files(tmp_folder: pathlib.Path) -> list[str]:
+    (tmp_folder / "config.json").write_text(json.dumps(CONFIG))
+    (tmp_folder / "good.c").write_text("/// @}\n")
+    (tmp_folder / "bad.c").write_text("nothing\n")
+    return ["--header-config=config.json:doxygen", "good.c", "bad.c"]
+
+
+def test_run_through_server(
+    tmp_folder: pathlib.Path, socket_path: str, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: a running server, and files relative to the directory of the client
+    argv = write_files(tmp_folder)
+    cwd = os.getcwd()
+    os.chdir(tmp_folder)
+    try:
+        # WHEN: we run a hook through the server
+        with (
+            mock.patch.dict(os.environ, {"PRE_COMMIT_HOOKS_SOCKET": socket_path}),
+            mock.patch.object(
+                client, "_run_locally", side_effect=AssertionError("not served")
+            ),
+        ):
+            exit_code = client.main(["check-header-footer", *argv])
+    finally:
+        os.chdir(cwd)
+    # THEN: we get the exit code, and the output, of the hook
+    assert exit_code == ExitCode.FAIL
+    assert capsys.readouterr().out == "Failed on check 'doxygen' for file bad.c\n"
+    #  and the directory of the server is unchanged
+    assert os.getcwd() == cwd
+
+
+def test_run_through_server_bad_arguments(
+    socket_path: str, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: a running server
+    # WHEN: we run a hook with arguments it does not know
+    exit_code = client.run("check-header-footer", ["--nope"], socket_path)
+    # THEN: we get the error of the hook, and the server keeps running
+    assert exit_code == 2
+    assert "unrecognized arguments: --nope" in capsys.readouterr().err
+    assert client.run("check-header-footer", [], socket_path) == ExitCode.OK
+
+
+def test_server_survives_bad_clients(
+    socket_path: str, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: a running server
+    # WHEN: clients send nothing, a request that is not JSON, or not an object
+    for request in (b"", b"not json\n", b"[]\n"):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as bad_client:
+            bad_client.connect(socket_path)
+            bad_client.sendall(request)
+            bad_client.shutdown(socket.SHUT_WR)
+            bad_client.recv(1)
+    # THEN: the errors are logged, and the server keeps running
+    assert "JSONDecodeError" in capsys.readouterr().err
+    assert os.path.exists(socket_path)
+    with mock.patch.object(
+        client, "_run_locally", side_effect=AssertionError("not served")
+    ):
+        assert client.run("check-header-footer", [], socket_path) == ExitCode.OK
+
+
+def test_run_ignores_other_users_server(
+    socket_path: str, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: a running server, whose socket belongs to another user
+    with (
+        mock.patch.object(client.os, "getuid", return_value=os.getuid() + 1),
+        mock.patch.object(client, "_run_locally", return_value=ExitCode.OK) as local,
+    ):
+        # WHEN: we run a hook through the client
+        exit_code = client.run("check-header-footer", [], socket_path)
+    # THEN: the hook runs in the client instead, and says why
+    assert exit_code == ExitCode.OK
+    local.assert_called_once_with("check-header-footer", [])
+    assert "belongs to another user" in capsys.readouterr().err
+
+
+def test_run_without_reply(tmp_folder: pathlib.Path):
+    # GIVEN: a server that closes the connection without replying
+    socket_path = str(tmp_folder / "mute.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as mute_server:
+        mute_server.bind(socket_path)
+        mute_server.listen(1)
+
+        def hang_up() -> None:
+            connection, _ = mute_server.accept()
+            with connection:
+                connection.recv(4096)
+
+        thread = threading.Thread(target=hang_up)
+        thread.start()
+        # WHEN: we run a hook through the client
+        with mock.patch.object(
+            client, "_run_locally", return_value=ExitCode.OK
+        ) as local:
+            exit_code = client.run("check-header-footer", [], socket_path)
+        thread.join()
+    # THEN: the hook runs in the client instead
+    assert exit_code == ExitCode.OK
+    local.assert_called_once_with("check-header-footer", [])
+
+
+def test_run_without_server(
+    tmp_folder: pathlib.Path, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: no server is running
+    argv = write_files(tmp_folder)
+    cwd = os.getcwd()
+    os.chdir(tmp_folder)
+    try:
+        # WHEN: we run a hook through the client
+        exit_code = client.run("check-header-footer", argv, str(tmp_folder / "no.sock"))
+    finally:
+        os.chdir(cwd)
+    # THEN: the hook runs in the client instead
+    assert exit_code == ExitCode.FAIL
+    assert capsys.readouterr().out == "Failed on check 'doxygen' for file bad.c\n"
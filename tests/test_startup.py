@@ -0,0 +1,97 @@
+"""Test the cost of starting a hook."""
+
+from __future__ import annotations
+
+import codecs
+import os
+import subprocess
+import sys
+
+import pytest
+
+HOOK_MODULES = [
+    "pre_commit_hooks.arabic_presentation_form",
+    "pre_commit_hooks.check_header_footer",
+]
+
+# Modules only needed once there is a file to fix, or by options that are opt-in.
+LAZY_MODULES = [
+    "importlib.metadata",
+    "concurrent.futures",
+    "tempfile",
+    "shutil",
+    "hashlib",
+    "pre_commit_hooks.cache",
+    "pre_commit_hooks.arabic_presentation_form.engine",
+    "pre_commit_hooks.arabic_presentation_form.report",
+    "pre_commit_hooks.arabic_presentation_form.bytes_engine",
+    "pre_commit_hooks.arabic_presentation_form.presentation_forms",
+    "pre_commit_hooks.arabic_presentation_form.vectorized",
+    "numpy",
+]
+
+# Time spent in the modules of this package itself, generous to not be flaky.
+IMPORT_TIME_BUDGET_US = 100_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Import a module in a fresh interpreter.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        dict[str, int]: The time spent importing every module, itself, in us.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONIOENCODING": "latin-1"},
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.mark.parametrize("module", HOOK_MODULES)
+def test_import_is_lazy(module: str):
+    # GIVEN: a hook module
+    # WHEN: it is imported in a fresh interpreter
+    times = import_times(module)
+    # THEN: the modules that are not always needed are not imported
+    assert [name for name in LAZY_MODULES if name in times] == []
+    #  and the package itself imports within budget
+    own_time = sum(t for name, t in times.items() if name.startswith("pre_commit_"))
+    assert own_time < IMPORT_TIME_BUDGET_US
+
+
+@pytest.mark.parametrize("module", HOOK_MODULES)
+def test_import_keeps_stdout(module: str):
+    # GIVEN: a hook module
+    # WHEN: it is imported, with an encoding for stdout that is not UTF-8
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(sys.stdout.encoding)"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONIOENCODING": "latin-1"},
+    )
+    # THEN: stdout is left as it is, only main() changes it
+    assert codecs.lookup(result.stdout.strip()) == codecs.lookup("latin-1")
+
+
+def test_client_import_is_light():
+    # GIVEN: the client, that runs for every batch of files
+    # WHEN: it is imported in a fresh interpreter
+    times = import_times("pre_commit_hooks.client")
+    # THEN: it does not import the hooks
+    assert [name for name in times if name.startswith("pre_commit_hooks.")] == [
+        "pre_commit_hooks.client"
+    ]
+    assert "argparse" not in times
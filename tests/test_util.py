@@ -2,13 +2,16 @@
 
 from __future__ import annotations
 
+import io
+import json
 import pathlib
+import pstats
 import tempfile
 from unittest import mock
 
 import pytest
 
-from pre_commit_hooks import util
+from pre_commit_hooks import profiling, util
 from pre_commit_hooks.util import ExitCode
 
 from . import conftest
@@ -52,6 +55,113 @@ def test_abc_hook():
     assert implementation_mock.call_count == 1
 
 
+class ParallelDemoHook(util.ABCHook):
+    """Module level, so it can be sent to worker processes."""
+
+    def setup_parser(self) -> None:
+        pass
+
+    def implementation(self, file_name, args) -> ExitCode:
+        print(f"checked {file_name}")
+        print(f"done {file_name}")
+        return ExitCode.FAIL if file_name.name.startswith("bad") else ExitCode.OK
+
+
+@pytest.mark.parametrize(
+    ("file_names", "expected"),
+    [
+        ([f"good_{i}" for i in range(20)], ExitCode.OK),
+        ([f"good_{i}" for i in range(20)] + ["bad_0"], ExitCode.FAIL),
+    ],
+    ids=["pass", "fail"],
+)
+def test_abc_hook_parallel(
+    file_names: list[str], expected: ExitCode, capsys: pytest.CaptureFixture[str]
+):
+    # GIVEN: a hook and many files
+    h = ParallelDemoHook()
+    # WHEN: we run the hook with multiple workers
+    exit_code = h.run(["--jobs", "3", *file_names])
+    # THEN: the results are combined
+    assert exit_code == expected
+    #  and the output is grouped per file, in the order the files were given
+    assert capsys.readouterr().out.splitlines() == [
+        line for f in file_names for line in (f"checked {f}", f"done {f}")
+    ]
+
+
+def test_abc_hook_cache():
+    # GIVEN: a hook that passes on files that start with "good"
+    implementation_mock = mock.MagicMock()
+
+    class CachedDemoHook(util.ABCHook):
+        def setup_parser(self) -> None:
+            self.parser.add_argument("--option", default="a")
+
+        def implementation(self, file_name, args) -> ExitCode:
+            implementation_mock(file_name.name)
+            is_good = file_name.read_text().startswith("good")
+            return ExitCode.OK if is_good else ExitCode.FAIL
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        good_file = pathlib.Path(tmp_folder) / "good.txt"
+        good_file.write_text("good")
+        bad_file = pathlib.Path(tmp_folder) / "bad.txt"
+        bad_file.write_text("bad")
+        argv = ["--cache-dir", f"{tmp_folder}/cache", str(good_file), str(bad_file)]
+        # WHEN: we run the hook twice
+        assert CachedDemoHook().run(argv) == ExitCode.FAIL
+        assert CachedDemoHook().run(argv) == ExitCode.FAIL
+        # THEN: the file that passed is only checked once
+        assert [c.args[0] for c in implementation_mock.call_args_list] == [
+            "good.txt",
+            "bad.txt",
+            "bad.txt",
+        ]
+        # WHEN: the arguments, or the file, change
+        implementation_mock.reset_mock()
+        CachedDemoHook().run(["--option", "b", *argv])
+        bad_file.write_text("good now")
+        CachedDemoHook().run(argv)
+        # THEN: the files are checked again
+        assert [c.args[0] for c in implementation_mock.call_args_list] == [
+            "good.txt",
+            "bad.txt",
+            "bad.txt",
+        ]
+
+
+@pytest.mark.parametrize(
+    ("hook_by_stat", "argv", "expected"),
+    [
+        (False, [], False),
+        (True, [], True),
+        (True, ["--no-cache-by-stat"], False),
+        (False, ["--cache-by-stat"], True),
+    ],
+    ids=["content", "hook default", "override off", "override on"],
+)
+def test_abc_hook_cache_by_stat(hook_by_stat: bool, argv: list[str], expected: bool):
+    # GIVEN: a hook that chooses how the cache identifies files
+    class CachedDemoHook(util.ABCHook):
+        cache_by_stat = hook_by_stat
+
+        def setup_parser(self) -> None:
+            pass
+
+        def implementation(self, file_name, args) -> ExitCode:
+            return ExitCode.OK
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        test_file = pathlib.Path(tmp_folder) / "test.txt"
+        test_file.write_text("good")
+        # WHEN: we run it with the cache
+        with mock.patch("pre_commit_hooks.cache.ResultCache") as cache_mock:
+            CachedDemoHook().run(["--cache-dir", tmp_folder, *argv, str(test_file)])
+        # THEN: the cache identifies files as chosen, unless overridden
+        assert cache_mock.call_args.kwargs["by_stat"] is expected
+
+
 @pytest.mark.parametrize(
     "linesep",
     [("\r\n"), ("\n")],
@@ -74,3 +184,168 @@ def test_move_file_pointer_to_end_of_file(linesep: str):
     # THEN: after we use the sanitization method we read the expected lines
     decoded_lines = [util.sanitize_rb_line(line) for line in received_lines]
     assert decoded_lines == lines_to_write[-n_readback:]
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 8192])
+@pytest.mark.parametrize(
+    ("content", "n", "expected"),
+    [
+        (b"", 3, []),
+        (b"0\n1\n2", 1, [b"2"]),
+        (b"0\n1\n2", 2, [b"1\n", b"2"]),
+        (b"0\n1\n2\n", 1, [b"2\n"]),
+        (b"0\r\n1\r\n2\r\n", 2, [b"1\r\n", b"2\r\n"]),
+        (b"0\n1\n", 5, [b"0\n", b"1\n"]),
+        (b"0\n1\n\n", 1, [b"\n"]),
+        (b"0\n" + b"x" * 100 + b"\n", 1, [b"x" * 100 + b"\n"]),
+    ],
+    ids=[
+        "empty",
+        "no trailing newline",
+        "no trailing newline, 2 lines",
+        "trailing newline",
+        "crlf",
+        "fewer lines",
+        "empty last line",
+        "long line",
+    ],
+)
+def test_read_last_lines(content: bytes, n: int, expected: list[bytes], block_size):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a file
+        tmp_file = pathlib.Path(tmp_folder) / "tmp_files.txt"
+        tmp_file.write_bytes(content)
+        with tmp_file.open("rb") as fp:
+            # WHEN: we find the start of the last lines
+            offset = util.find_nth_line_before_end(fp, n=n, block_size=block_size)
+            # THEN: we read the expected lines from there
+            fp.seek(offset)
+            assert fp.readlines() == expected
+            assert util.read_last_lines(fp, n=n) == expected
+
+
+def test_find_nth_line_before_end_max_bytes():
+    # GIVEN: a file with a huge last line
+    fp = io.BytesIO(b"first\n" + b"x" * 10_000 + b"\n")
+    # WHEN: we find the start of the last line, looking only a few bytes back
+    offset = util.find_nth_line_before_end(fp, n=1, max_bytes=100)  # type: ignore[arg-type]
+    # THEN: we stop in the middle of the line
+    assert offset == len(fp.getvalue()) - 100
+
+
+class TimedDemoHook(util.ABCHook):
+    """Module level, so it can be sent to worker processes."""
+
+    def setup_parser(self) -> None:
+        pass
+
+    def implementation(self, file_name, args) -> ExitCode:
+        with profiling.span("read"):
+            file_name.read_bytes()
+        with profiling.span("match"):
+            pass
+        return ExitCode.OK
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_abc_hook_timings(jobs: int, capsys: pytest.CaptureFixture[str]):
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: a hook that reports its phases, and files of different sizes
+        files = []
+        for idx in range(3):
+            file = pathlib.Path(tmp_folder) / f"file_{idx}.txt"
+            file.write_bytes(b"x" * 1000 * idx)
+            files.append(str(file))
+        trace_file = pathlib.Path(tmp_folder) / "trace.json"
+        profile_file = pathlib.Path(tmp_folder) / "run.prof"
+        # WHEN: we run it with timings, and profiled
+        exit_code = TimedDemoHook().run(
+            [
+                f"--jobs={jobs}",
+                "--timings",
+                "--timings-top=2",
+                f"--timings-file={trace_file}",
+                f"--profile={profile_file}",
+                *files,
+            ]
+        )
+        # THEN: the slowest files are reported, with their phases
+        assert exit_code == ExitCode.OK
+        report = capsys.readouterr().err.splitlines()
+        assert report[0].startswith("Slowest 2 of 3 files")
+        assert len(report) == 3
+        assert all("[read " in line and ", match " in line for line in report[1:])
+        #  and the trace has every file, and every phase
+        events = json.loads(trace_file.read_text())["traceEvents"]
+        assert sorted(e["name"] for e in events) == sorted(
+            [*files, *["read", "match"] * 3]
+        )
+        assert {e["args"].get("bytes") for e in events if e["name"] in files} == {
+            0,
+            1000,
+            2000,
+        }
+        #  and the profile can be loaded
+        assert pstats.Stats(str(profile_file)).total_calls > 0
+
+
+def test_cache_fingerprint_ignores_run_args():
+    # GIVEN: a hook
+    h = TimedDemoHook()
+    # WHEN: only arguments that do not change the result differ
+    fingerprints = {
+        h.cache_fingerprint(h.parser.parse_args(argv))
+        for argv in (["a"], ["--jobs=2", "--timings", "--profile=run.prof", "b"])
+    }
+    # THEN: the fingerprint is the same
+    assert len(fingerprints) == 1
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"), [("0", 0), ("5", 5), ("-1", None), ("x", None)]
+)
+def test_cache_size_argument(value: str, expected: int | None):
+    # GIVEN: a hook
+    h = TimedDemoHook()
+    # WHEN: we parse a --cache-size
+    if expected is None:
+        # THEN: negative values, and values that are not numbers, are rejected
+        with pytest.raises(SystemExit):
+            h.parser.parse_args([f"--cache-size={value}"])
+    else:
+        # THEN: counts from 0 are accepted
+        assert h.parser.parse_args([f"--cache-size={value}"]).cache_size == expected
+
+
+class PrefetchDemoHook(util.ABCHook):
+    def setup_parser(self) -> None:
+        self.seen: list[tuple[str, bytes | None]] = []
+
+    def implementation(self, file_name, args) -> ExitCode:
+        self.seen.append((file_name.name, self.prefetched(file_name)))
+        return ExitCode.OK
+
+
+def test_abc_hook_prefetch():
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # GIVEN: small files, one given twice, and one too large to read ahead
+        files = []
+        for idx in range(5):
+            file = pathlib.Path(tmp_folder) / f"file_{idx}.txt"
+            file.write_bytes(f"content {idx}".encode())
+            files.append(str(file))
+        large_file = pathlib.Path(tmp_folder) / "large.txt"
+        large_file.write_bytes(b"x" * (util.PREFETCH_MAX_BYTES + 1))
+        h = PrefetchDemoHook()
+        # WHEN: we run the hook, reading files ahead
+        exit_code = h.run(["--prefetch=2", *files, files[0], str(large_file)])
+        # THEN: the hook gets the contents of every small file, in order
+        assert exit_code == ExitCode.OK
+        assert h.seen == [
+            *[(f"file_{idx}.txt", f"content {idx}".encode()) for idx in range(5)],
+            #  but reads a file given twice, and a large file, itself
+            ("file_0.txt", None),
+            ("large.txt", None),
+        ]
+        #  and nothing is left over for later calls
+        assert h.prefetched(pathlib.Path(files[-1])) is None